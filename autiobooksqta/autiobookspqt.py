@@ -22,8 +22,10 @@ from autiobooksqta.audio_monitor_worker import AudioMonitorWorker
 from autiobooksqta.output_options import OutputOptionsDialog
 # Import from the engine module
 from autiobooksqta.engine_pyqt import (get_gpu_acceleration_available, gen_audio_segments,
-
-                                       get_book, get_title, get_author)
+                                       warm_pipeline,
+                                       get_book, load_book, extract_in_background,
+                                       get_title, get_author)
+from autiobooksqta.chapter_extractor import VISIBLE, CHECKED, is_extracted
 from autiobooksqta.voices_lang import voices, voices_emojified, deemojify_voice
 
 from autiobooksqta.conversion_working import ConversionWorker
@@ -47,11 +49,20 @@ class PlayButtonUpdateEvent(QEvent):
 class BookLoadedEvent(QEvent):
     EVENT_TYPE = QEvent.Type(QEvent.registerEventType())
 
-    def __init__(self, book, chapters, cover):
+    def __init__(self, book, chapters, cover, file_path=None):
         super().__init__(BookLoadedEvent.EVENT_TYPE)
         self.book = book
         self.chapters = chapters
         self.cover = cover
+        self.file_path = file_path
+
+
+class ChapterExtractedEvent(QEvent):
+    EVENT_TYPE = QEvent.Type(QEvent.registerEventType())
+
+    def __init__(self, chapter):
+        super().__init__(ChapterExtractedEvent.EVENT_TYPE)
+        self.chapter = chapter
 
 
 class BookErrorEvent(QEvent):
@@ -77,6 +88,11 @@ class AudiobooksApp(QMainWindow):
         self.current_playing_chapter = None
         self.chapter_checkboxes = {}
 
+        # Widgets of each chapter row, updated as its text is extracted
+        self.chapter_rows = {}
+        # Extracts chapter text in the background after the list is shown
+        self.chapter_extractor = None
+
         # Dictionary to track chapter play buttons
         self.chapter_play_buttons = {}
 
@@ -214,6 +230,7 @@ class AudiobooksApp(QMainWindow):
         self.voice_combo = QComboBox()
         self.voice_combo.addItems(voices_emojified)
         self.voice_combo.setCurrentText(voices[0])
+        self.voice_combo.currentTextChanged.connect(self.warm_selected_voice)
 
         voice_combo_layout.addWidget(voice_label)
         voice_combo_layout.addWidget(self.voice_combo)
@@ -289,6 +306,10 @@ class AudiobooksApp(QMainWindow):
         scroll_area = QScrollArea()
         scroll_area.setWidgetResizable(True)
         scroll_area.setStyleSheet("border: none; background-color: transparent;")
+        # Rows scrolled into view have their text extracted first
+        scroll_area.verticalScrollBar().valueChanged.connect(self.prioritize_visible_chapters)
+        scroll_area.verticalScrollBar().rangeChanged.connect(self.prioritize_visible_chapters)
+        self.chapters_scroll_area = scroll_area
 
         self.chapters_container = QWidget()
         self.chapters_container.setStyleSheet("background-color: transparent;")
@@ -402,6 +423,20 @@ class AudiobooksApp(QMainWindow):
         except ValueError:
             self.speed_entry.setStyleSheet("color: #cc0000; border: 1px solid #cc0000;")
 
+    def warm_selected_voice(self):
+        """Load the pipeline for the selected voice's language in the background"""
+        lang_code = deemojify_voice(self.voice_combo.currentText())[0]
+
+        def warm():
+            try:
+                warm_pipeline(lang_code)
+            except Exception as e:
+                print(f"Non-critical error warming pipeline '{lang_code}': {e}")
+
+        warm_thread = threading.Thread(target=warm)
+        warm_thread.daemon = True
+        warm_thread.start()
+
     def check_all_chapters(self):
         """Select all chapters"""
         for checkbox in self.chapter_checkboxes.values():
@@ -444,12 +479,14 @@ class AudiobooksApp(QMainWindow):
             # Wrap the get_book call in a more robust error handler
             book, chapters_from_book, book_cover = None, [], None
             try:
-                book, chapters_from_book, book_cover = get_book(file_path, True)
+                # Books opened before come straight from the book cache; others
+                # are listed at once and their text extracted in the background
+                book, chapters_from_book, book_cover = load_book(file_path, lazy=True)
             except Exception as inner_e:
                 print(f"Initial load error: {str(inner_e)}")
                 # Try a fallback approach - load without cover image first
                 try:
-                    book, chapters_from_book, book_cover = get_book(file_path, False)
+                    book, chapters_from_book, book_cover = get_book(file_path, False, lazy=True)
                     # If this works, try to get the cover separately
                     if book:
                         try:
@@ -463,7 +500,7 @@ class AudiobooksApp(QMainWindow):
             # Process the loaded book in the main thread
             QApplication.instance().postEvent(
                 self,
-                BookLoadedEvent(book, chapters_from_book, book_cover)
+                BookLoadedEvent(book, chapters_from_book, book_cover, file_path)
             )
         except Exception as e:
             # Handle any exceptions during loading
@@ -475,7 +512,10 @@ class AudiobooksApp(QMainWindow):
     def event(self, event):
         """Handle custom events"""
         if isinstance(event, BookLoadedEvent):
-            self.process_loaded_book(event.book, event.chapters, event.cover)
+            self.process_loaded_book(event.book, event.chapters, event.cover, event.file_path)
+            return True
+        elif isinstance(event, ChapterExtractedEvent):
+            self.update_chapter_row(event.chapter)
             return True
         elif isinstance(event, BookErrorEvent):
             self.handle_book_loading_error(event.error_msg)
@@ -486,12 +526,19 @@ class AudiobooksApp(QMainWindow):
             return True
         return super().event(event)
 
-    def process_loaded_book(self, book, chapters, cover):
+    def process_loaded_book(self, book, chapters, cover, file_path=None):
         """Process loaded book data and update UI"""
         if not book:
             self.handle_book_loading_error("Failed to load the book: Unknown error")
             return
 
+        # The previous book's text is no longer needed
+        if self.chapter_extractor is not None:
+            self.chapter_extractor.stop()
+            self.chapter_extractor = None
+        if self.book is not None and self.book is not book:
+            self.close_book(self.book)
+
         # Store the book
         self.book = book
 
@@ -534,6 +581,13 @@ class AudiobooksApp(QMainWindow):
             # Update chapters list
             self.chapters = chapters
             self.populate_chapters()
+            self.chapter_extractor = extract_in_background(
+                file_path or self.file_path_label.text(), book, chapters, cover,
+                on_extracted=lambda chapter: QApplication.instance().postEvent(
+                    self, ChapterExtractedEvent(chapter))
+            )
+            # Once the rows are laid out, extract the ones on screen first
+            QTimer.singleShot(0, self.prioritize_visible_chapters)
 
             # Update status bar
             self.status_bar.showMessage(f"Loaded book: {get_title(self.book)} with {len(self.chapters)} chapters")
@@ -541,6 +595,14 @@ class AudiobooksApp(QMainWindow):
         except Exception as e:
             self.handle_book_loading_error(f"Error updating UI after loading book: {str(e)}")
 
+    def close_book(self, book):
+        """Close a replaced book's EPUB, once any conversion using it ends"""
+        worker = getattr(self, 'conversion_worker', None)
+        if worker is not None and worker.isRunning() and worker.conversion.book is book:
+            worker.finished.connect(book.close)
+        else:
+            book.close()
+
     def handle_book_loading_error(self, error_msg):
         """Display error message when book loading fails"""
         # Custom error dialog
@@ -573,6 +635,7 @@ class AudiobooksApp(QMainWindow):
         # Clear previous state
         self.chapter_checkboxes.clear()
         self.chapter_play_buttons.clear()
+        self.chapter_rows.clear()
 
         # Remove all existing widgets from the layout
         while self.chapters_container_layout.count() > 0:
@@ -582,7 +645,11 @@ class AudiobooksApp(QMainWindow):
 
         # Add chapters with checkboxes
         for chapter in self.chapters:
-            word_count = len(chapter.extracted_text.split())
+            # Cached and extracted chapters carry their word count; lazily
+            # loaded ones get it when their text is extracted
+            word_count = getattr(chapter, 'word_count', None)
+            if word_count is None and is_extracted(chapter):
+                word_count = len(chapter.extracted_text.split())
 
             if word_count == 0:
                 continue
@@ -605,6 +672,9 @@ class AudiobooksApp(QMainWindow):
             checkbox = QCheckBox()
             checkbox.setChecked(False)
             checkbox.setMinimumWidth(15)
+            checkbox.toggled.connect(
+                lambda checked, ch=chapter: self.prioritize_checked_chapter(ch, checked)
+            )
             self.chapter_checkboxes[chapter] = checkbox
 
             # Create a unique ID for this chapter
@@ -639,13 +709,13 @@ class AudiobooksApp(QMainWindow):
             chapter_info.setMinimumWidth(120)
 
             # Word count display
-            word_string = "words" if word_count != 1 else "word"
-            word_count_label = QLabel(f"({word_count} {word_string})")
+            word_count_label = QLabel(self.word_count_text(word_count))
             word_count_label.setStyleSheet("color: #777777; font-size: 10px;")
             word_count_label.setFixedWidth(80)
 
             # Preview text - with improved readability
-            preview_text = QLabel(self.get_limited_text(chapter.extracted_text))
+            preview_text = QLabel(self.get_limited_text(chapter.extracted_text)
+                                  if is_extracted(chapter) else "")
             preview_text.setStyleSheet("color: #555555; font-style: italic; font-size: 10px;")
             preview_text.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Preferred)
             preview_text.setWordWrap(True)
@@ -660,6 +730,46 @@ class AudiobooksApp(QMainWindow):
 
             # Add the chapter frame to the container
             self.chapters_container_layout.insertWidget(self.chapters_container_layout.count() - 1, chapter_frame)
+            self.chapter_rows[chapter] = {
+                'frame': chapter_frame,
+                'word_count': word_count_label,
+                'preview': preview_text
+            }
+
+    def word_count_text(self, word_count):
+        if word_count is None:
+            return "(… words)"
+        word_string = "words" if word_count != 1 else "word"
+        return f"({word_count} {word_string})"
+
+    def update_chapter_row(self, chapter):
+        """Fill in a row once its chapter's text has been extracted"""
+        row = self.chapter_rows.get(chapter)
+        if row is None:
+            return
+        if chapter.word_count == 0:
+            # Empty chapters aren't listed, as when loading eagerly
+            self.chapter_checkboxes[chapter].setChecked(False)
+            row['frame'].hide()
+            return
+        row['word_count'].setText(self.word_count_text(chapter.word_count))
+        row['preview'].setText(self.get_limited_text(chapter.extracted_text))
+
+    def prioritize_visible_chapters(self, *args):
+        """Move the rows currently in view to the front of extraction"""
+        if self.chapter_extractor is None:
+            return
+        top = self.chapters_scroll_area.verticalScrollBar().value()
+        bottom = top + self.chapters_scroll_area.viewport().height()
+        visible = [chapter for chapter, row in self.chapter_rows.items()
+                   if not is_extracted(chapter)
+                   and row['frame'].y() < bottom and row['frame'].y() + row['frame'].height() > top]
+        if visible:
+            self.chapter_extractor.prioritize(visible, VISIBLE)
+
+    def prioritize_checked_chapter(self, chapter, checked):
+        if checked and self.chapter_extractor is not None:
+            self.chapter_extractor.prioritize([chapter], CHECKED)
 
     def get_limited_text(self, text):
         """Limit text to a manageable length for display"""
@@ -730,9 +840,10 @@ class AudiobooksApp(QMainWindow):
                 # Reset state tracking for previous chapter
                 curr_chapter_info['is_playing'] = False
 
-        # Now play the new chapter
-        text = self.get_limited_text(chapter.extracted_text)
-        if not text:
+        # Now play the new chapter. Text not extracted yet is extracted on
+        # the preview thread, which may wait for an extraction in progress.
+        extractor = self.chapter_extractor
+        if is_extracted(chapter) and not self.get_limited_text(chapter.extracted_text):
             return
 
         # Update UI to show this button is preparing
@@ -783,9 +894,17 @@ class AudiobooksApp(QMainWindow):
                 if self.debug_mode:
                     print(f"Generating audio for chapter {chapter_id}")
 
+                if extractor is not None:
+                    extractor.ensure([chapter])
+                text = self.get_limited_text(chapter.extracted_text)
+                if not text:
+                    # Nothing to preview; reset the button as if playback ended
+                    self.playing_sample = False
+                    self.audio_monitor.playback_finished.emit()
+                    return
 
                 # Generate audio
-                audio_segments = gen_audio_segments(text, voice, speed, split_pattern=r"")
+                audio_segments = gen_audio_segments(text, voice, speed)
                 QApplication.processEvents()
 
                 # Post status update from thread
@@ -971,11 +1090,17 @@ class AudiobooksApp(QMainWindow):
             speed,
             use_gpu,
             file_path,
+            chapter_extractor=self.chapter_extractor,
             output_folder=output_options['output_folder'],
             create_m4b=output_options['create_m4b'],
             create_mp3=output_options['create_mp3'],
             mp3_quality=output_options['mp3_quality'],
-            keep_wav=output_options['keep_wav']
+            keep_wav=output_options['keep_wav'],
+            synthesis_workers=output_options['synthesis_workers'],
+            use_segment_cache=output_options['use_segment_cache'],
+            batch_size=output_options['batch_size'],
+            extra_voices=output_options['extra_voices'],
+            stream_m4b=output_options['stream_m4b']
         )
         self.conversion_worker.progress_updated.connect(self.update_progress)
         self.conversion_worker.conversion_complete.connect(self.on_conversion_complete)
@@ -1020,6 +1145,12 @@ class AudiobooksApp(QMainWindow):
         if self.audio_monitor:
             self.audio_monitor.stop()
 
+        if self.chapter_extractor is not None:
+            self.chapter_extractor.stop()
+
+        if self.book is not None:
+            self.close_book(self.book)
+
         # Stop any playing audio
         try:
             pygame.mixer.music.stop()
@@ -0,0 +1,200 @@
+import sys
+import time
+
+import torch
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
+
+# Longest phoneme string the model accepts, leaving room for the two pad tokens
+MAX_PHONEMES = 510
+
+# Largest per-sample difference from unbatched synthesis that batching may make
+BATCH_TOLERANCE = 1e-3
+
+# id(model) -> whether batched_forward matched unbatched output for it
+_batching_verified = {}
+
+
+def supports_g2p(pipeline):
+    """Whether the pipeline's English G2P can be run on its own, as
+    phonemize does. True for G2P-only pipelines (model=False) too."""
+    return pipeline.lang_code in 'ab' and hasattr(pipeline, 'en_tokenize')
+
+
+def supports_phoneme_input(pipeline):
+    """Whether the pipeline's English G2P and KModel can be driven directly,
+    as phoneme caching and batching do"""
+    return supports_g2p(pipeline) and pipeline.model is not None
+
+
+def phonemize(pipeline, text):
+    """Run the text frontend only and return the phoneme strings KPipeline
+    would have sent to the model, in order"""
+    phonemes = []
+    _, tokens = pipeline.g2p(text)
+    for gs, ps, tks in pipeline.en_tokenize(tokens):
+        if ps:
+            phonemes.append(ps[:MAX_PHONEMES])
+    return phonemes
+
+
+@torch.no_grad()
+def batched_forward(model, phoneme_batch, ref_s, speed):
+    """Padded-batch version of KModel.forward_with_tokens. ref_s holds one
+    style vector per item (B, 256). Returns one audio tensor per item.
+
+    The text encoders and duration predictor run as one padded batch; their
+    LSTMs are packed and their norms are per position, so padding doesn't
+    reach the real tokens. The F0/energy predictor and the decoder normalize
+    over the whole frame axis (InstanceNorm/AdaIN) and run a bidirectional
+    LSTM over it, so they run per item on that item's frames only."""
+    device = model.device
+    ids = [[0, *[model.vocab[p] for p in ps if p in model.vocab], 0] for ps in phoneme_batch]
+    lengths = torch.tensor([len(item) for item in ids], dtype=torch.long, device=device)
+    batch, max_len = len(ids), int(lengths.max())
+
+    input_ids = torch.zeros((batch, max_len), dtype=torch.long, device=device)
+    for b, item in enumerate(ids):
+        input_ids[b, :len(item)] = torch.tensor(item, dtype=torch.long, device=device)
+    # True where the position is padding
+    text_mask = torch.arange(max_len, device=device).unsqueeze(0) >= lengths.unsqueeze(1)
+    ref_s = ref_s.to(device)
+    s = ref_s[:, 128:]
+
+    bert_dur = model.bert(input_ids, attention_mask=(~text_mask).int())
+    d_en = model.bert_encoder(bert_dur).transpose(-1, -2)
+    d = model.predictor.text_encoder(d_en, s, lengths, text_mask)
+
+    # Pack so the bidirectional LSTM never reads padding
+    packed = pack_padded_sequence(d, lengths.cpu(), batch_first=True, enforce_sorted=False)
+    x, _ = model.predictor.lstm(packed)
+    x, _ = pad_packed_sequence(x, batch_first=True, total_length=max_len)
+    duration = torch.sigmoid(model.predictor.duration_proj(x)).sum(axis=-1) / speed
+    pred_dur = torch.round(duration).clamp(min=1).long()
+    pred_dur[text_mask] = 0
+    frames = pred_dur.sum(axis=-1)
+    max_frames = int(frames.max())
+
+    pred_aln_trg = torch.zeros((batch, max_len, max_frames), device=device)
+    positions = torch.arange(max_len, device=device)
+    for b in range(batch):
+        indices = torch.repeat_interleave(positions, pred_dur[b])
+        pred_aln_trg[b, indices, torch.arange(indices.shape[0], device=device)] = 1
+
+    en = d.transpose(-1, -2) @ pred_aln_trg
+    t_en = model.text_encoder(input_ids, lengths, text_mask)
+    asr = t_en @ pred_aln_trg
+
+    audio = []
+    for b in range(batch):
+        n = int(frames[b])
+        F0_pred, N_pred = model.predictor.F0Ntrain(en[b:b + 1, :, :n], s[b:b + 1])
+        item = model.decoder(asr[b:b + 1, :, :n], F0_pred, N_pred, ref_s[b:b + 1, :128])
+        audio.append(item.squeeze().cpu())
+    return audio
+
+
+def batching_matches_serial(pipeline, pack, phonemes, speed, tolerance=BATCH_TOLERANCE):
+    """Synthesize phonemes one at a time and as a batch and check the audio
+    agrees to within tolerance. The decoder draws random noise, so both runs
+    start from the same seed and decode the items in the same order."""
+    seed = torch.seed()
+    torch.manual_seed(seed)
+    serial = [pipeline.model(ps, pack[len(ps) - 1], speed) for ps in phonemes]
+    torch.manual_seed(seed)
+    ref_s = torch.cat([pack[len(ps) - 1] for ps in phonemes], dim=0)
+    batched = batched_forward(pipeline.model, phonemes, ref_s, speed)
+    for ps, a, b in zip(phonemes, serial, batched):
+        a, b = a.detach().cpu().flatten(), b.detach().cpu().flatten()
+        if a.shape != b.shape:
+            print(f"Batched audio length differs ({b.shape[0]} vs {a.shape[0]} samples)")
+            return False
+        difference = float((a - b).abs().max()) if a.numel() else 0.0
+        if difference > tolerance:
+            print(f"Batched audio differs from unbatched by up to {difference:.2e}")
+            return False
+    return True
+
+
+def synthesize_phonemes(pipeline, voice, speed, phonemes, batch_size):
+    """Synthesize phoneme strings in batches of similar length and return
+    the audio in the original order"""
+    pack = pipeline.load_voice(voice)
+    model_key = id(pipeline.model)
+    if batch_size > 1 and model_key not in _batching_verified and len(phonemes) > 1:
+        # Checked once per model, on this call's shortest strings to keep it cheap
+        shortest = sorted(phonemes, key=len)[:batch_size]
+        _batching_verified[model_key] = batching_matches_serial(pipeline, pack, shortest, float(speed))
+        if not _batching_verified[model_key]:
+            print("Batched synthesis disabled for this model; using batch size 1")
+    if batch_size <= 1 or not _batching_verified.get(model_key, False):
+        # Same call KPipeline makes for each phoneme string
+        return [pipeline.model(ps, pack[len(ps) - 1], float(speed)) for ps in phonemes]
+    order = sorted(range(len(phonemes)), key=lambda i: len(phonemes[i]))
+    audio = [None] * len(phonemes)
+    for start in range(0, len(order), batch_size):
+        group = order[start:start + batch_size]
+        group_phonemes = [phonemes[i] for i in group]
+        # Voice packs hold one style vector per phoneme length
+        ref_s = torch.cat([pack[len(ps) - 1] for ps in group_phonemes], dim=0)
+        outputs = batched_forward(pipeline.model, group_phonemes, ref_s, float(speed))
+        for i, output in zip(group, outputs):
+            audio[i] = output
+    return audio
+
+
+class ThroughputMeter:
+    """Audio seconds produced per wall-clock second"""
+
+    def __init__(self, sample_rate=24000):
+        self.sample_rate = sample_rate
+        self.samples = 0
+        self.started = time.perf_counter()
+
+    def add(self, samples):
+        self.samples += samples
+
+    @property
+    def audio_seconds(self):
+        return self.samples / self.sample_rate
+
+    @property
+    def wall_seconds(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def realtime_factor(self):
+        wall = self.wall_seconds
+        return self.audio_seconds / wall if wall else 0.0
+
+    def summary(self):
+        return (f"{self.audio_seconds:.1f}s of audio in {self.wall_seconds:.1f}s "
+                f"({self.realtime_factor:.2f} audio s per wall s)")
+
+
+def benchmark_batch_sizes(text, voice, speed=1.0, batch_sizes=(1, 4, 8, 16)):
+    """Synthesize text at each batch size and print the throughput gain
+    over batch size 1. The segment cache is bypassed."""
+    from autiobooksqta.engine_pyqt import iter_chunk_audio, split_text, set_segment_cache_enabled
+
+    set_segment_cache_enabled(False)
+    chunks = split_text(text)
+    baseline = None
+    results = {}
+    for batch_size in batch_sizes:
+        meter = ThroughputMeter()
+        for _, segments in iter_chunk_audio(chunks, voice, speed, batch_size=batch_size):
+            for audio in segments:
+                meter.add(len(audio))
+        results[batch_size] = meter.realtime_factor
+        if baseline is None:
+            baseline = meter.realtime_factor
+        gain = meter.realtime_factor / baseline if baseline else 0.0
+        print(f"batch size {batch_size:>3}: {meter.summary()}, {gain:.2f}x vs batch size {batch_sizes[0]}")
+    return results
+
+
+if __name__ == "__main__":
+    # python -m autiobooksqta.batched_inference sample.txt [voice]
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        sample_text = f.read()
+    benchmark_batch_sizes(sample_text, sys.argv[2] if len(sys.argv) > 2 else 'af_heart')
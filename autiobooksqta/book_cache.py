@@ -0,0 +1,174 @@
+import base64
+import hashlib
+import json
+import os
+import struct
+import threading
+import uuid
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".audiobooks_cache", "books")
+DEFAULT_MAX_ENTRIES = 500
+
+# Bump when extraction changes so stale chapter texts are not reused
+CACHE_FORMAT = 2
+
+# End of central directory record: signature, then fixed fields, then a
+# comment of up to 64 KiB
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_SIZE = 22
+EOCD_SEARCH = EOCD_SIZE + 65535
+
+
+def central_directory_digest(f, size):
+    """SHA-256 of the zip's central directory, which lists every member with
+    its CRC and sizes, so any content change alters it. Falls back to the
+    tail of the file if the archive has no readable directory."""
+    f.seek(max(0, size - EOCD_SEARCH))
+    tail = f.read()
+    end = tail.rfind(EOCD_SIGNATURE)
+    if end >= 0 and len(tail) - end >= EOCD_SIZE:
+        cd_size, cd_offset = struct.unpack('<II', tail[end + 12:end + 20])
+        if cd_offset + cd_size <= size:
+            f.seek(cd_offset)
+            return hashlib.sha256(f.read(cd_size)).hexdigest()
+    return hashlib.sha256(tail).hexdigest()
+
+
+def book_fingerprint(file_path):
+    """Cheap identity of an EPUB file: size, mtime and central directory
+    hash. Reads only the end of the archive."""
+    stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        digest = central_directory_digest(f, stat.st_size)
+    raw = f"{CACHE_FORMAT}\x1f{stat.st_size}\x1f{stat.st_mtime_ns}\x1f{digest}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class CachedChapter:
+    """A chapter restored from the cache: the attributes the app reads from
+    ebooklib items, plus the stats stored with it"""
+
+    def __init__(self, entry):
+        self.file_name = entry['file_name']
+        self.extracted_text = entry['text']
+        self.word_count = entry['words']
+        self.char_count = entry['characters']
+
+    def get_name(self):
+        return self.file_name
+
+
+class CachedBook:
+    """Stands in for an ebooklib book restored from the cache. Title and
+    author come from the cache; anything else (such as get_items() for the
+    full-size cover when the m4b is built) loads the EPUB on first use."""
+
+    def __init__(self, file_path, metadata):
+        self.file_path = file_path
+        self.cached_metadata = metadata
+        self._book = None
+
+    def _load(self):
+        if self._book is None:
+            from autiobooksqta.epub_reader import LazyEpub
+            self._book = LazyEpub(self.file_path)
+        return self._book
+
+    def get_metadata(self, namespace, name):
+        if namespace == 'DC' and name in self.cached_metadata:
+            value = self.cached_metadata[name]
+            return [(value, {})] if value else []
+        return self._load().get_metadata(namespace, name)
+
+    def close(self):
+        """Close the EPUB if it was loaded"""
+        if self._book is not None:
+            self._book.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+
+class BookCache:
+    """On-disk cache of parsed books keyed by book_fingerprint. An entry
+    holds the chapter texts and their word and character counts, the title
+    and author, and the resized cover thumbnail, so reopening a book skips
+    reading the EPUB. The least recently used entries are dropped past
+    max_entries."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, file_path):
+        """(book, chapters, cover thumbnail) for a cached EPUB, or None"""
+        try:
+            path = self.path(book_fingerprint(file_path))
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Touch the entry so LRU eviction sees it as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        cover = base64.b64decode(data['cover']) if data.get('cover') else None
+        book = CachedBook(file_path, data['metadata'])
+        return book, [CachedChapter(entry) for entry in data['chapters']], cover
+
+    def put(self, file_path, title, creator, chapters, cover):
+        """Store a parsed book; chapters need file_name and extracted_text"""
+        entries = []
+        for chapter in chapters:
+            text = chapter.extracted_text
+            entries.append({
+                'file_name': chapter.file_name,
+                'text': text,
+                'words': len(text.split()),
+                'characters': len(text)
+            })
+        data = {
+            'metadata': {'title': title, 'creator': creator},
+            'chapters': entries,
+            'cover': base64.b64encode(cover).decode('ascii') if isinstance(cover, bytes) else None
+        }
+        path = self.path(book_fingerprint(file_path))
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    pass
+            entries.sort()
+            for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                pass
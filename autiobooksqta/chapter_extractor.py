@@ -0,0 +1,165 @@
+import heapq
+import itertools
+import threading
+
+from autiobooksqta.text_extractor import extract_text, extract_texts
+
+# Extraction priorities, most urgent first
+VISIBLE = 0
+CHECKED = 1
+BACKGROUND = 2
+
+# BACKGROUND chapters are extracted this many at a time through
+# extract_texts, so large books use the process pool; a chapter moved ahead
+# waits for at most one batch
+BACKGROUND_BATCH = 64
+
+
+def set_text(chapter, text):
+    chapter.word_count = len(text.split())
+    chapter.char_count = len(text)
+    chapter.extracted_text = text
+
+
+def extract_chapter(chapter):
+    """Set extracted_text, word_count and char_count on a chapter descriptor.
+    A document that can't be read gets empty text."""
+    try:
+        text = extract_text(chapter.get_content())
+    except Exception as e:
+        print(f"Could not extract {chapter.get_name()}: {e}")
+        text = ''
+    set_text(chapter, text)
+
+
+def extract_chapters(chapters):
+    """extract_chapter for many chapters at once: their documents go through
+    extract_texts, which spreads large amounts of XHTML over the process
+    pool"""
+    readable = []
+    documents = []
+    for chapter in chapters:
+        try:
+            documents.append(chapter.get_content())
+            readable.append(chapter)
+        except Exception as e:
+            print(f"Could not extract {chapter.get_name()}: {e}")
+            set_text(chapter, '')
+    try:
+        texts = extract_texts(documents)
+    except Exception:
+        # One bad document fails the whole batch; find it chapter by chapter
+        for chapter in readable:
+            extract_chapter(chapter)
+        return
+    for chapter, text in zip(readable, texts):
+        set_text(chapter, text)
+
+
+def is_extracted(chapter):
+    return hasattr(chapter, 'extracted_text')
+
+
+class ChapterExtractor:
+    """Extracts chapter text on a background thread, most urgent first.
+    Every chapter starts at BACKGROUND in reading order and is extracted in
+    batches of BACKGROUND_BATCH; prioritize() moves chapters ahead (the rows
+    on screen, the ones checked for conversion), which are extracted one at
+    a time, and ensure() extracts on the calling thread when the text is
+    needed right away. on_extracted(chapter) is called from the
+    extraction thread after each chapter, on_finished() once all are done."""
+
+    def __init__(self, chapters, on_extracted=None, on_finished=None):
+        self.chapters = list(chapters)
+        self.on_extracted = on_extracted
+        self.on_finished = on_finished
+        self._priority = {}
+        self._heap = []
+        self._order = itertools.count()
+        # Guards the heap and priorities
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Held while a chapter is extracted, so a chapter is extracted once
+        self._extract_lock = threading.Lock()
+        self._running = True
+        for chapter in self.chapters:
+            self._push(chapter, BACKGROUND)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _push(self, chapter, priority):
+        # Superseded heap entries are skipped when popped
+        self._priority[id(chapter)] = priority
+        heapq.heappush(self._heap, (priority, next(self._order), chapter))
+
+    def prioritize(self, chapters, priority):
+        """Extract these chapters before any of lower priority"""
+        with self._lock:
+            for chapter in chapters:
+                if is_extracted(chapter):
+                    continue
+                if priority < self._priority.get(id(chapter), BACKGROUND + 1):
+                    self._push(chapter, priority)
+            self._wakeup.notify()
+
+    def _next(self):
+        """The most urgent chapter on its own, or the next batch of
+        BACKGROUND chapters; an empty list once all are extracted"""
+        with self._lock:
+            while self._running:
+                batch = []
+                while self._heap and len(batch) < BACKGROUND_BATCH:
+                    priority, _, chapter = self._heap[0]
+                    if batch and priority < BACKGROUND:
+                        break
+                    heapq.heappop(self._heap)
+                    if self._priority.get(id(chapter)) != priority or is_extracted(chapter):
+                        continue
+                    batch.append(chapter)
+                    if priority < BACKGROUND:
+                        break
+                if batch:
+                    return batch
+                if all(is_extracted(c) for c in self.chapters):
+                    return []
+                self._wakeup.wait()
+            return []
+
+    def _extract(self, chapters):
+        """Extract those of chapters not yet extracted; returns them"""
+        with self._extract_lock:
+            pending = [chapter for chapter in chapters if not is_extracted(chapter)]
+            if len(pending) == 1:
+                extract_chapter(pending[0])
+            elif pending:
+                extract_chapters(pending)
+            return pending
+
+    def _run(self):
+        while True:
+            batch = self._next()
+            if not batch:
+                break
+            for chapter in self._extract(batch):
+                if self.on_extracted:
+                    self.on_extracted(chapter)
+        if self._running and self.on_finished:
+            self.on_finished()
+
+    def ensure(self, chapters):
+        """Extract any of these chapters that aren't yet, on this thread,
+        all at once through extract_texts"""
+        for chapter in self._extract(chapters):
+            if self.on_extracted:
+                self.on_extracted(chapter)
+
+    def done(self):
+        return all(is_extracted(c) for c in self.chapters)
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._wakeup.notify()
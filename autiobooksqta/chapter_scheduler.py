@@ -0,0 +1,49 @@
+import heapq
+
+from autiobooksqta.engine_pyqt import get_phoneme_cache, split_text
+
+# Phonemes per character of English text, for chunks not in the phoneme cache
+PHONEMES_PER_CHAR = 0.85
+
+# Fixed per-chunk cost (one inference call) in phoneme equivalents
+CHUNK_OVERHEAD = 20
+
+
+def chapter_cost(text, lang_code):
+    """Estimated synthesis cost of a chapter in phonemes. Model time tracks
+    the phonemes it reads, so chunks already in the phoneme cache count
+    their exact phonemes; the rest are estimated from their length."""
+    cache = get_phoneme_cache()
+    cost = 0
+    for chunk in split_text(text):
+        phonemes = cache.get(chunk, lang_code) if cache is not None else None
+        if phonemes is None:
+            cost += len(chunk) * PHONEMES_PER_CHAR
+        else:
+            cost += sum(len(p) for p in phonemes)
+        cost += CHUNK_OVERHEAD
+    return cost
+
+
+def longest_first(chapter_jobs, costs):
+    """chapter_jobs ordered by descending cost, ties in chapter order.
+    Dispatching the longest chapters first keeps one long chapter from
+    being left to run alone at the end."""
+    order = sorted(range(len(chapter_jobs)), key=lambda n: (-costs[n], n))
+    return [chapter_jobs[n] for n in order]
+
+
+def makespan(costs, workers):
+    """Finish time when costs are dispatched in the given order, each to
+    the first worker to become free"""
+    finish = [0.0] * max(1, workers)
+    for cost in costs:
+        heapq.heapreplace(finish, finish[0] + cost)
+    return max(finish)
+
+
+def makespan_lower_bound(costs, workers):
+    """No schedule can beat the longest chapter or an even split of the work"""
+    if not costs:
+        return 0.0
+    return max(max(costs), sum(costs) / max(1, workers))
@@ -0,0 +1,214 @@
+# autiobooksqta/cli.py
+"""Headless batch conversion: autiobooksqta-cli BOOK_OR_FOLDER [...]
+
+Converts every given EPUB (folders are searched recursively) in one
+process, so the voice model is loaded once and reused for every book.
+With --queue the books are added to a job queue instead, which any number
+of `autiobooksqta-cli --queue DB --work` processes drain together. With
+--shard-dir the queue is a directory shared by several machines, and a
+worker started on each node drains it."""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+MP3_QUALITIES = {
+    "low": "Low (64 kbps)",
+    "medium": "Medium (128 kbps)",
+    "high": "High (192 kbps)",
+    "very-high": "Very High (256 kbps)"
+}
+
+
+def find_epubs(paths):
+    """EPUB files named directly or found under the given folders, in order"""
+    books = []
+    for path in paths:
+        if os.path.isdir(path):
+            books.extend(sorted(str(p) for p in Path(path).rglob("*.epub")))
+        else:
+            books.append(path)
+    return books
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="autiobooksqta-cli",
+        description="Convert EPUB books to audiobooks without the GUI"
+    )
+    parser.add_argument("paths", nargs="*", help="EPUB files or folders containing EPUBs")
+    parser.add_argument("-v", "--voice", default="af_heart", help="Kokoro voice (default: af_heart)")
+    parser.add_argument("--extra-voice", action="append", default=[], dest="extra_voices",
+                        help="Also render with this voice, into a per-voice subfolder (repeatable)")
+    parser.add_argument("-s", "--speed", type=float, default=1.0, help="Reading speed (default: 1.0)")
+    parser.add_argument("-o", "--output", help="Output folder (default: next to each book)")
+    parser.add_argument("--no-m4b", action="store_true", help="Don't create the m4b audiobook")
+    parser.add_argument("--mp3", action="store_true", help="Create one MP3 per chapter")
+    parser.add_argument("--mp3-quality", choices=MP3_QUALITIES, default="medium")
+    parser.add_argument("--keep-wav", action="store_true", help="Keep the chapter WAV files")
+    parser.add_argument("--stream-m4b", action="store_true",
+                        help="Encode the m4b in a single pass without chapter WAVs")
+    parser.add_argument("--gpu", action="store_true", help="Use CUDA if available")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes synthesizing chapters in parallel (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="Text chunks per inference call (default: 1)")
+    parser.add_argument("--no-segment-cache", action="store_true",
+                        help="Don't reuse previously synthesized audio")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Start over instead of resuming interrupted conversions")
+
+    queue = parser.add_argument_group("job queue")
+    location = queue.add_mutually_exclusive_group()
+    location.add_argument("--queue", metavar="DB",
+                          help="Add the books to this SQLite job queue instead of converting them")
+    location.add_argument("--shard-dir", metavar="DIR",
+                          help="Like --queue, but a directory shared by several machines (e.g. NFS)")
+    queue.add_argument("--work", action="store_true",
+                       help="Drain the job queue until every queued book is finished")
+    queue.add_argument("--nodes", type=int, default=1,
+                       help="Worker processes to start with --work, each acting as a node (default: 1)")
+    queue.add_argument("--claim-timeout", type=float,
+                       help="Seconds before a crashed worker's chapter is handed out again")
+    queue.add_argument("--status", action="store_true", help="Print the job queue state")
+    queue.add_argument("--retry-failed", action="store_true",
+                       help="Send failed books and chapters back to the queue")
+    args = parser.parse_args(argv)
+    queued = args.queue or args.shard_dir
+    if not args.paths and not (queued and (args.work or args.status or args.retry_failed)):
+        parser.error("give EPUB paths, or --queue/--shard-dir with --work, --status or --retry-failed")
+    return args
+
+
+def open_queue(queue_path, shard_dir, claim_timeout=None):
+    options = {'claim_timeout': claim_timeout} if claim_timeout else {}
+    if shard_dir:
+        from autiobooksqta.shard_queue import ShardQueue
+        return ShardQueue(shard_dir, **options)
+    from autiobooksqta.job_queue import JobQueue
+    return JobQueue(queue_path, **options)
+
+
+def work_queue(queue_path, shard_dir, claim_timeout, use_gpu, worker_id=None, nodes=1):
+    """Worker process entry point; the cores are split between the nodes
+    started on this machine"""
+    from autiobooksqta.encode_scheduler import available_cores
+    from autiobooksqta.queue_worker import QueueWorker
+    queue = open_queue(queue_path, shard_dir, claim_timeout)
+    QueueWorker(queue, worker_id, use_gpu=use_gpu,
+                num_threads=max(1, available_cores() // nodes)).run()
+
+
+def run_queue(args, books):
+    queue = open_queue(args.queue, args.shard_dir, args.claim_timeout)
+
+    if args.retry_failed:
+        queue.retry_failed()
+
+    if books:
+        from autiobooksqta.queue_worker import enqueue_book, shard_book
+        add = shard_book if args.shard_dir else enqueue_book
+        for book_path in books:
+            book_id = add(
+                queue, book_path, args.voice, args.speed,
+                output_folder=args.output,
+                create_m4b=not args.no_m4b,
+                create_mp3=args.mp3,
+                mp3_quality=MP3_QUALITIES[args.mp3_quality],
+                keep_wav=args.keep_wav,
+                use_segment_cache=not args.no_segment_cache,
+                batch_size=args.batch_size
+            )
+            if book_id is not None:
+                print(f"Queued {book_path} as book {book_id}")
+
+    if args.work and args.nodes > 1:
+        # Local processes standing in for separate nodes
+        import multiprocessing
+        from autiobooksqta.job_queue import default_worker_id
+        context = multiprocessing.get_context('spawn')
+        workers = [context.Process(target=work_queue,
+                                   args=(args.queue, args.shard_dir, args.claim_timeout, args.gpu,
+                                         f"{default_worker_id()}-node{n}", args.nodes))
+                   for n in range(1, args.nodes + 1)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    elif args.work:
+        work_queue(args.queue, args.shard_dir, args.claim_timeout, args.gpu)
+
+    if args.status or args.work:
+        status = queue.status()
+        print(f"Books: {status['books']}")
+        print(f"Chapters: {status['chapters']}")
+        print(f"Chapter synthesis: {status['chapter_seconds']:.1f}s total, "
+              f"{status['mean_chapter_seconds']:.1f}s mean, "
+              f"{status['longest_chapter_seconds']:.1f}s longest")
+    return 0
+
+
+def main(argv=None):
+    # Parsed first so --help and bad arguments exit before any install
+    args = parse_args(argv)
+
+    from autiobooksqta.__main__ import install_bundled_model
+    install_bundled_model()
+
+    # Imported late so --help works without loading torch
+    from autiobooksqta.conversion_engine import SynthesisPool, convert_book
+    from autiobooksqta.engine_pyqt import set_gpu_acceleration, warm_pipeline
+
+    books = find_epubs(args.paths)
+    if args.queue or args.shard_dir:
+        return run_queue(args, books)
+    if not books:
+        print("No EPUB files found")
+        return 1
+
+    set_gpu_acceleration(args.gpu)
+    pool = None
+    if args.workers > 1 and not args.stream_m4b:
+        # One set of synthesis processes serves every book
+        pool = SynthesisPool(args.workers, args.gpu, args.voice[0], not args.no_segment_cache)
+    else:
+        warm_pipeline(args.voice[0])
+
+    failed = []
+    try:
+        for number, book_path in enumerate(books, start=1):
+            print(f"=== Book {number} of {len(books)}: {book_path}")
+            try:
+                ok = convert_book(
+                    book_path, args.voice, args.speed, use_gpu=args.gpu,
+                    output_folder=args.output,
+                    create_m4b=not args.no_m4b,
+                    create_mp3=args.mp3,
+                    mp3_quality=MP3_QUALITIES[args.mp3_quality],
+                    keep_wav=args.keep_wav,
+                    synthesis_workers=args.workers,
+                    use_segment_cache=not args.no_segment_cache,
+                    resume=not args.no_resume,
+                    batch_size=args.batch_size,
+                    extra_voices=args.extra_voices,
+                    stream_m4b=args.stream_m4b,
+                    synthesis_pool=pool
+                )
+            except Exception as e:
+                print(f"Error converting {book_path}: {e}")
+                ok = False
+            if not ok:
+                failed.append(book_path)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    print(f"Converted {len(books) - len(failed)} of {len(books)} books")
+    for book_path in failed:
+        print(f"Failed: {book_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,610 @@
+from pathlib import Path
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+
+from autiobooksqta.engine_pyqt import get_book, set_gpu_acceleration, get_title, get_author, convert_text_to_wav_file, \
+    create_index_file, \
+    get_cover_image, mux_m4b, convert_wav_to_m4a, convert_wav_to_mp3, convert_wav_to_outputs, \
+    M4A_CODEC_ARGS, mp3_codec_args, warm_pipeline, init_synthesis_worker, synthesize_chapter, \
+    set_segment_cache_enabled, create_pipeline, split_text, get_phonemes, concatenate_wavs, \
+    get_phoneme_cache
+from autiobooksqta.batched_inference import supports_g2p
+from autiobooksqta.job_journal import ConversionJournal, wav_frames
+from autiobooksqta.text_chunker import TARGET_TOKENS, split_paragraph_units
+from autiobooksqta.encode_pipeline import ChapterEncoder
+from autiobooksqta.encode_scheduler import get_encode_scheduler
+from autiobooksqta.m4b_stream import StreamingM4bWriter, PcmPipeEncoder, stream_text_to_encoders
+from autiobooksqta.chapter_scheduler import chapter_cost, longest_first, makespan, makespan_lower_bound
+
+# Chapters longer than this many characters are synthesized in parallel parts
+SUBCHAPTER_CHARS = 40000
+
+# Map quality setting to bitrate
+MP3_BITRATES = {
+    "Low (64 kbps)": "64k",
+    "Medium (128 kbps)": "128k",
+    "High (192 kbps)": "192k",
+    "Very High (256 kbps)": "256k"
+}
+
+
+def _print_progress(percent, message):
+    print(f"[{percent:3d}%] {message}")
+
+
+def _print_error(message):
+    print(f"Error: {message}")
+
+
+class SynthesisPool:
+    """Process pool of synthesis workers, each holding its own loaded
+    pipeline. A pool can be passed to several BookConversions in a row so
+    the model stays loaded between books."""
+
+    def __init__(self, workers, use_gpu, lang_code, use_segment_cache=True):
+        self.workers = workers
+        self.threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_synthesis_worker,
+            initargs=(use_gpu, lang_code, self.threads_per_worker, use_segment_cache)
+        )
+
+    def submit(self, *args):
+        return self.executor.submit(synthesize_chapter, *args)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class BookConversion:
+    """Converts the selected chapters of one book to WAV, MP3 and M4B. Plain
+    Python with no Qt dependency: progress and errors are reported through
+    the on_progress(percent, message) and on_error(message) callbacks, and
+    stop() may be called from any thread."""
+
+    def __init__(self, book, chapters_selected, voice, speed, use_gpu, file_path,
+                 output_folder=None, create_m4b=True, create_mp3=False,
+                 mp3_quality="Medium (128 kbps)", keep_wav=False, debug_mode=False,
+                 synthesis_workers=1, use_segment_cache=True, resume=True, batch_size=1,
+                 extra_voices=None, stream_m4b=False, multi_output_encode=True,
+                 on_progress=None, on_error=None, synthesis_pool=None):
+        self.on_progress = on_progress or _print_progress
+        self.on_error = on_error or _print_error
+        self.book = book
+        self.chapters_selected = chapters_selected
+        self.voice = voice
+        # Voices to render the book with; with several, each gets a subfolder
+        self.voices = [voice] + [v for v in (extra_voices or []) if v != voice]
+        self.speed = speed
+        self.use_gpu = use_gpu
+        self.file_path = file_path
+        self.base_output_folder = output_folder or os.path.dirname(file_path)
+        self.create_m4b = create_m4b
+        self.create_mp3 = create_mp3
+        self.mp3_quality = mp3_quality
+        self.keep_wav = keep_wav or create_mp3  # Always keep WAVs if MP3 creation is requested
+        self.running = True
+        self.debug_mode = debug_mode
+        # Number of processes synthesizing chapters in parallel (1 = serial)
+        self.synthesis_workers = max(1, int(synthesis_workers or 1))
+        # Reuse audio already synthesized for identical text, voice and speed
+        self.use_segment_cache = use_segment_cache
+        # Continue an interrupted conversion of the same book and settings
+        self.resume = resume
+        self.journal = None
+        # Text chunks run through the model together per inference call
+        self.batch_size = max(1, int(batch_size or 1))
+        # Synthesize straight into one ffmpeg encoder, without WAV files
+        self.stream_m4b = stream_m4b and create_m4b
+        # Encode every rendition of a chapter from one ffmpeg process
+        self.multi_output_encode = multi_output_encode
+        # Long-lived synthesis processes shared with other conversions
+        self.synthesis_pool = synthesis_pool
+        # Progress is reported from the synthesis loop and encoder threads
+        self.progress_lock = threading.Lock()
+        self.total_steps = 1
+        self.current_step = 0
+
+        self.base_filename = Path(file_path).name.replace('.epub', '')
+
+        # Create subfolder paths
+        self.set_output_folder(self.base_output_folder)
+
+    def run(self):
+        """Convert the book with every voice. Returns True on success, False
+        if the conversion was stopped or reported an error; exceptions
+        propagate to the caller."""
+        if len(self.voices) > 1:
+            self.prephonemize()
+
+        for voice_number, voice in enumerate(self.voices, start=1):
+            self.voice = voice
+            if len(self.voices) > 1:
+                # Each voice gets its own wav/mp3/m4b tree
+                self.set_output_folder(os.path.join(self.base_output_folder, voice))
+                self.on_progress(
+                    0, f"Rendering voice {voice_number} of {len(self.voices)}: {voice}")
+            if not self.convert_voice():
+                return False
+
+        self.on_progress(100, "Conversion complete")
+        return True
+
+    def set_output_folder(self, output_folder):
+        self.output_folder = output_folder
+        self.wav_folder = os.path.join(self.output_folder, "wav")
+        self.mp3_folder = os.path.join(self.output_folder, "mp3")
+        self.m4b_folder = os.path.join(self.output_folder, "m4b")
+
+    def chapter_jobs(self):
+        """(chapter index, text, WAV path) for each selected chapter"""
+        return [(i, text, os.path.join(self.wav_folder, f"{self.base_filename}_chapter_{i}.wav"))
+                for i, text in enumerate(self.chapter_texts(), start=1)]
+
+    def open_journal(self):
+        return ConversionJournal(
+            self.output_folder, self.base_filename,
+            # Chunk offsets are only meaningful for the same chunking
+            {'voice': self.voice, 'speed': float(self.speed), 'chunk_tokens': TARGET_TOKENS},
+            resume=self.resume
+        )
+
+    def chapter_texts(self):
+        """Text to synthesize for each selected chapter, in order"""
+        title = get_title(self.book)
+        creator = get_author(self.book)
+        texts = []
+        for i, chapter in enumerate(self.chapters_selected, start=1):
+            text = chapter.extracted_text
+            if i == 1:
+                text = f"{title} by {creator}.\n{text}"
+            texts.append(text)
+        return texts
+
+    def prephonemize(self):
+        """Run the text frontend once for every language among the voices, so
+        each voice's pass finds its phonemes in the phoneme cache"""
+        if get_phoneme_cache() is None:
+            # Nowhere to keep the phonemes; each pass would run G2P again
+            return
+        chunks = [chunk for text in self.chapter_texts() for chunk in split_text(text)]
+        for lang_code in sorted({voice[0] for voice in self.voices}):
+            pipeline = create_pipeline(lang_code, model=False)
+            if not supports_g2p(pipeline):
+                continue
+            for n, chunk in enumerate(chunks, start=1):
+                if not self.running:
+                    return
+                if n % 100 == 1:
+                    self.on_progress(
+                        int((n / len(chunks)) * 100),
+                        f"Phonemizing text ({n} of {len(chunks)} chunks)"
+                    )
+                get_phonemes(pipeline, chunk)
+
+    def convert_voice(self):
+        """Convert the selected chapters with self.voice into self.output_folder.
+        Returns False if the conversion was stopped or failed."""
+        if self.stream_m4b:
+            return self.convert_voice_streaming()
+
+        # Ensure output directory exists
+        os.makedirs(self.output_folder, exist_ok=True)
+
+        # Create subfolders as needed; chapter WAVs are always written
+        os.makedirs(self.wav_folder, exist_ok=True)
+        if self.create_mp3:
+            os.makedirs(self.mp3_folder, exist_ok=True)
+        if self.create_m4b:
+            os.makedirs(self.m4b_folder, exist_ok=True)
+
+        title = get_title(self.book)
+        creator = get_author(self.book)
+
+        # Calculate total steps
+        base_steps = len(self.chapters_selected)
+        m4b_steps = 2 if self.create_m4b else 0  # Index + M4B creation
+        mp3_steps = len(self.chapters_selected) if self.create_mp3 else 0
+        self.total_steps = base_steps + m4b_steps + mp3_steps
+        self.current_step = 0
+
+        chapter_jobs = self.chapter_jobs()
+        self.journal = self.open_journal()
+
+        # Encoding runs alongside synthesis: each finished chapter WAV is
+        # handed to the encoder while the next chapter is synthesized
+        self.m4a_files = {}
+        # Exact sample counts reported by synthesis, for the chapter index
+        self.chapter_samples = {}
+        # Private workspace for this job's m4a files, chapter index, concat
+        # list and cover, so concurrent conversions never collide
+        self.workspace = tempfile.mkdtemp(prefix="autiobooks_job_")
+        self.m4a_folder = os.path.join(self.workspace, "m4a")
+        os.makedirs(self.m4a_folder)
+        encode_stages = []
+        if self.multi_output_encode and self.create_m4b and self.create_mp3:
+            encode_stages.append(("m4a+mp3", self.encode_all))
+        else:
+            if self.create_m4b:
+                encode_stages.append(("m4a", self.encode_m4a))
+            if self.create_mp3:
+                encode_stages.append(("mp3", self.encode_mp3))
+        encoder = ChapterEncoder(encode_stages) if encode_stages else None
+        scheduler = get_encode_scheduler()
+
+        try:
+            # Chapters finished by an interrupted earlier run are reused
+            finished = {}
+            pending_jobs = []
+            for i, text, wav_filename in chapter_jobs:
+                if self.journal.chapter_complete(i, text, wav_filename):
+                    finished[i] = os.path.abspath(wav_filename)
+                    print(f"Reusing WAV file from earlier run: {finished[i]}")
+                    self.report_step(f"Chapter {i} already converted")
+                    if encoder:
+                        encoder.submit(i, finished[i])
+                else:
+                    pending_jobs.append((i, text, wav_filename))
+
+            on_chapter_done = encoder.submit if encoder else None
+            units = self.synthesis_units(pending_jobs) if self.synthesis_workers > 1 else []
+            if len(units) > 1:
+                created = self.synthesize_parallel(pending_jobs, on_chapter_done, units)
+            else:
+                # torch's intra-op threads use every core; once synthesis is
+                # done, encoding may use them for the tail
+                reserved = scheduler.cores if pending_jobs else 0
+                scheduler.reserve(reserved)
+                try:
+                    created = self.synthesize_serial(pending_jobs, on_chapter_done)
+                finally:
+                    scheduler.release(reserved)
+            if created is None:
+                return False
+            finished.update(created)
+            wav_files = [finished[i] for i, _, _ in chapter_jobs if i in finished]
+
+            if not wav_files:
+                self.on_error("No chapters were converted.")
+                return False
+
+            if encoder:
+                self.on_progress(self.percent(), "Finishing encoding")
+                self.on_progress(self.percent(), f"Encoding finished: {encoder.finish()}")
+
+            # Create M4B if requested
+            if self.create_m4b:
+                self.report_step("Creating index file")
+
+                # Create index file in the job workspace
+                index_file = os.path.join(self.workspace, "chapters.txt")
+                create_index_file(title, creator, wav_files, index_file,
+                                  [self.chapter_samples.get(i) for i, _, _ in chapter_jobs
+                                   if i in finished])
+
+                self.report_step("Creating m4b file")
+
+                # Get cover image
+                cover_image_full = get_cover_image(self.book, False)
+
+                # Create M4B in the m4b subfolder from the already encoded chapters
+                m4b_path = os.path.join(self.m4b_folder, f"{self.base_filename}.m4b")
+                m4a_files = [self.m4a_files[i] for i, _, _ in chapter_jobs if i in self.m4a_files]
+                mux_m4b(m4a_files, m4b_path, cover_image_full, index_file, self.workspace)
+        finally:
+            # Encoder jobs write into the workspace; on an error they must
+            # stop before it is removed. After finish() this returns at once.
+            if encoder:
+                encoder.cancel()
+            shutil.rmtree(self.workspace, ignore_errors=True)
+
+        # Clean up WAV files if not keeping them
+        if not self.keep_wav:
+            print(f"Cleaning up temporary files from: {self.wav_folder}")
+            print(f"Files to clean: {wav_files}")
+            self.on_progress(100, "Cleaning up temporary files...")
+
+            for wav_file in wav_files:
+                try:
+                    # Ensure we have the absolute path
+                    full_path = os.path.abspath(wav_file)
+                    if os.path.exists(full_path):
+                        os.remove(full_path)
+                        print(f"Deleted WAV file: {full_path}")
+                    else:
+                        print(f"WAV file not found for deletion: {full_path}")
+                except Exception as e:
+                    print(f"Warning: Could not delete WAV file {wav_file}: {str(e)}")
+
+            # Remove WAV folder if it's empty
+            try:
+                if os.path.exists(self.wav_folder) and not os.listdir(self.wav_folder):
+                    os.rmdir(self.wav_folder)
+                    print(f"Removed empty WAV folder: {self.wav_folder}")
+            except Exception as e:
+                print(f"Warning: Could not remove WAV folder: {str(e)}")
+
+        self.journal.finish()
+        return True
+
+    def convert_voice_streaming(self):
+        """Stream PCM from synthesis into one long-lived AAC encoder for the
+        m4b (and a per-chapter MP3 encoder when requested). Chapter markers
+        come from sample counts; no chapter WAV or m4a is written, only the
+        one m4a stream that is remuxed into the m4b.
+        Returns False if the conversion was stopped or failed."""
+        os.makedirs(self.m4b_folder, exist_ok=True)
+        if self.create_mp3:
+            os.makedirs(self.mp3_folder, exist_ok=True)
+
+        title = get_title(self.book)
+        creator = get_author(self.book)
+        self.total_steps = len(self.chapters_selected) + 1  # Chapters + M4B finalize
+        self.current_step = 0
+
+        set_gpu_acceleration(self.use_gpu)
+        set_segment_cache_enabled(self.use_segment_cache)
+        self.on_progress(0, "Loading voice model")
+        warm_pipeline(self.voice[0])
+
+        m4b_path = os.path.join(self.m4b_folder, f"{self.base_filename}.m4b")
+        writer = StreamingM4bWriter(m4b_path, title, creator, get_cover_image(self.book, False))
+        bitrate = MP3_BITRATES.get(self.mp3_quality, "128k")
+        try:
+            for i, text in enumerate(self.chapter_texts(), start=1):
+                if not self.running:
+                    writer.abort()
+                    return False
+
+                self.on_progress(
+                    self.percent(),
+                    f"Converting chapter {i} of {len(self.chapters_selected)}"
+                )
+                encoders = [writer]
+                mp3_encoder = None
+                if self.create_mp3:
+                    mp3_file = os.path.join(self.mp3_folder, f"{self.base_filename}_chapter_{i}.mp3")
+                    mp3_encoder = PcmPipeEncoder([*mp3_codec_args(bitrate), mp3_file])
+                    encoders.append(mp3_encoder)
+                try:
+                    samples = stream_text_to_encoders(text, self.voice, self.speed, encoders,
+                                                      self.batch_size)
+                finally:
+                    if mp3_encoder:
+                        mp3_encoder.close()
+                writer.add_chapter(samples)
+                self.report_step(f"Converted chapter {i} of {len(self.chapters_selected)}")
+        except BaseException:
+            writer.abort()
+            raise
+
+        if not writer.chapter_samples:
+            writer.abort()
+            self.on_error("No chapters were converted.")
+            return False
+
+        self.on_progress(self.percent(), "Creating m4b file")
+        writer.close()
+        self.report_step("Created m4b file")
+        return True
+
+    def percent(self):
+        return int((self.current_step / self.total_steps) * 100)
+
+    def report_step(self, message):
+        """Count one finished step and report progress. Called from the
+        synthesis loop and the encoder threads."""
+        with self.progress_lock:
+            self.current_step += 1
+            self.on_progress(self.percent(), message)
+
+    def synthesize_serial(self, chapter_jobs, on_chapter_done=None):
+        """Synthesize chapters one after another in this thread.
+        Returns {chapter index: WAV path}, or None if stopped."""
+        if not chapter_jobs:
+            return {}
+        set_gpu_acceleration(self.use_gpu)
+        set_segment_cache_enabled(self.use_segment_cache)
+
+        # Load the voice model once up front; every chapter reuses it
+        self.on_progress(self.percent(), "Loading voice model")
+        warm_pipeline(self.voice[0])
+
+        wav_files = {}
+        for i, text, wav_filename in chapter_jobs:
+            if not self.running:
+                return None
+
+            self.on_progress(
+                self.percent(),
+                f"Converting chapter {i} of {len(self.chapters_selected)}"
+            )
+
+            # Make sure we're storing the full path as created
+            checkpoint = self.journal.chapter_checkpoint(i, text)
+            samples = convert_text_to_wav_file(text, self.voice, self.speed, wav_filename,
+                                               checkpoint=checkpoint, batch_size=self.batch_size)
+            if samples:
+                # Ensure we have the absolute path with correct directory
+                full_path = os.path.abspath(wav_filename)
+                wav_files[i] = full_path
+                self.chapter_samples[i] = samples
+                self.journal.mark_chapter_done(i, text, full_path, samples)
+                print(f"Created WAV file: {full_path}")
+                if on_chapter_done:
+                    on_chapter_done(i, full_path)
+            self.report_step(f"Converted chapter {i} of {len(self.chapters_selected)}")
+        return wav_files
+
+    def synthesis_units(self, chapter_jobs):
+        """(chapter index, part number, text, WAV path) work units. Chapters
+        longer than SUBCHAPTER_CHARS are split at paragraph breaks into parts
+        (numbered from 1) so one huge chapter can use several workers; other
+        chapters are a single unit with part number None."""
+        units = []
+        for i, text, wav_filename in chapter_jobs:
+            parts = split_paragraph_units(text, SUBCHAPTER_CHARS)
+            if len(parts) == 1:
+                units.append((i, None, text, wav_filename))
+                continue
+            stem = os.path.splitext(wav_filename)[0]
+            for n, part in enumerate(parts, start=1):
+                units.append((i, n, part, f"{stem}.part{n}.wav"))
+        return units
+
+    def synthesize_parallel(self, chapter_jobs, on_chapter_done=None, units=None):
+        """Fan chapters, and parts of very long chapters, out to a process
+        pool, each process holding its own pipeline. A split chapter's parts
+        are journaled as they finish and joined into its WAV once all are
+        done, so a resumed run only synthesizes the missing parts. units is
+        synthesis_units(chapter_jobs) when the caller already has it.
+        Returns {chapter index: WAV path}, or None if stopped."""
+        if units is None:
+            units = self.synthesis_units(chapter_jobs)
+        jobs = {i: (text, wav_filename) for i, text, wav_filename in chapter_jobs}
+        parts_left = {i: sum(1 for unit in units if unit[0] == i) for i in jobs}
+        part_files = {i: {} for i in jobs}
+        results = {}
+
+        def unit_done(i, part, created):
+            parts_left[i] -= 1
+            if part is not None:
+                if created:
+                    part_files[i][part] = created[0]
+                    self.journal.mark_chapter_done(f"{i}.{part}", part_texts[(i, part)],
+                                                   created[0], created[1])
+                if parts_left[i]:
+                    return
+                # Join the parts in order; empty parts wrote no file
+                files = [part_files[i][n] for n in sorted(part_files[i])]
+                created = None
+                if files:
+                    created = jobs[i][1], concatenate_wavs(files, jobs[i][1])
+                for part_file in files:
+                    os.remove(part_file)
+
+            if created:
+                created_file, self.chapter_samples[i] = created
+                results[i] = os.path.abspath(created_file)
+                self.journal.mark_chapter_done(i, jobs[i][0], results[i], self.chapter_samples[i])
+                print(f"Created WAV file: {results[i]}")
+                if on_chapter_done:
+                    on_chapter_done(i, results[i])
+            self.report_step(f"Converted chapter {i} of {len(self.chapters_selected)}")
+
+        # Parts finished by an interrupted earlier run are reused
+        part_texts = {(i, part): text for i, part, text, _ in units if part is not None}
+        to_run = []
+        for i, part, text, wav_filename in units:
+            if part is not None and self.journal.chapter_complete(f"{i}.{part}", text, wav_filename):
+                print(f"Reusing WAV part from earlier run: {wav_filename}")
+                unit_done(i, part, (wav_filename, wav_frames(wav_filename)))
+            else:
+                to_run.append((i, part, text, wav_filename))
+        if not to_run:
+            return results
+
+        pool = self.synthesis_pool
+        if pool is None:
+            workers = min(self.synthesis_workers, len(to_run))
+            self.on_progress(self.percent(), f"Loading voice model in {workers} processes")
+            pool = SynthesisPool(workers, self.use_gpu, self.voice[0], self.use_segment_cache)
+        scheduler = get_encode_scheduler()
+        reserved = pool.workers * pool.threads_per_worker
+        scheduler.reserve(reserved)
+
+        # Longest units first, so no long chapter is left running alone at
+        # the end; results are still keyed and assembled by chapter index
+        costs = [chapter_cost(text, self.voice[0]) for _, _, text, _ in to_run]
+        print(f"Chapter schedule: {len(to_run)} units, estimated makespan "
+              f"{makespan(sorted(costs, reverse=True), pool.workers):.0f} longest first, "
+              f"{makespan(costs, pool.workers):.0f} in chapter order, "
+              f"lower bound {makespan_lower_bound(costs, pool.workers):.0f} (phonemes)")
+
+        futures = {}
+        try:
+            for i, part, text, wav_filename in longest_first(to_run, costs):
+                key = i if part is None else f"{i}.{part}"
+                checkpoint = self.journal.chapter_checkpoint(key, text)
+                future = pool.submit(text, self.voice, self.speed,
+                                     wav_filename, checkpoint, self.batch_size)
+                futures[future] = (i, part)
+
+            for future in as_completed(futures):
+                if not self.running:
+                    return None
+                i, part = futures[future]
+                unit_done(i, part, future.result())
+        finally:
+            scheduler.release(reserved)
+            if pool is self.synthesis_pool:
+                # Shared pool: drop this book's queued chapters, keep the processes
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+            else:
+                pool.shutdown()
+
+        return results
+
+    def m4a_output(self, i, wav_file):
+        return os.path.join(self.m4a_folder, Path(wav_file).stem + '.m4a')
+
+    def mp3_output(self, i):
+        # Create MP3 filename in mp3 subfolder
+        return os.path.join(
+            self.mp3_folder,
+            f"{self.base_filename}_chapter_{i}.mp3"
+        )
+
+    def encode_m4a(self, i, wav_file):
+        """Encode one finished chapter WAV to m4a for the m4b"""
+        m4a_file = self.m4a_output(i, wav_file)
+        convert_wav_to_m4a(wav_file, m4a_file)
+        self.m4a_files[i] = m4a_file
+
+    def encode_mp3(self, i, wav_file):
+        """Encode one finished chapter WAV to mp3"""
+        mp3_file = self.mp3_output(i)
+        bitrate = MP3_BITRATES.get(self.mp3_quality, "128k")
+        convert_wav_to_mp3(wav_file, mp3_file, bitrate)
+        print(f"Created MP3 file: {mp3_file}")
+        self.report_step(f"Created MP3 for chapter {i}")
+
+    def encode_all(self, i, wav_file):
+        """Decode a finished chapter WAV once and write the m4a and mp3
+        renditions from a single ffmpeg process"""
+        m4a_file = self.m4a_output(i, wav_file)
+        mp3_file = self.mp3_output(i)
+        bitrate = MP3_BITRATES.get(self.mp3_quality, "128k")
+        convert_wav_to_outputs(wav_file, [
+            (m4a_file, M4A_CODEC_ARGS),
+            (mp3_file, mp3_codec_args(bitrate))
+        ])
+        self.m4a_files[i] = m4a_file
+        print(f"Created MP3 file: {mp3_file}")
+        self.report_step(f"Created MP3 for chapter {i}")
+
+    def stop(self):
+        """Stop the conversion; takes effect at the next chapter boundary"""
+        self.running = False
+
+
+def convert_book(file_path, voice, speed=1.0, chapters=None, use_gpu=False, **options):
+    """Load an EPUB and convert it. chapters defaults to every chapter with
+    text. Remaining keyword arguments are BookConversion options. Returns
+    True on success."""
+    book, book_chapters, _ = get_book(file_path, False)
+    with book:
+        if chapters is None:
+            chapters = [c for c in book_chapters if c.extracted_text.strip()]
+        if not chapters:
+            print(f"No chapters with text in {file_path}")
+            return False
+        return BookConversion(book, chapters, voice, speed, use_gpu, file_path, **options).run()
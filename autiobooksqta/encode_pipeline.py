@@ -0,0 +1,53 @@
+import threading
+
+from autiobooksqta.encode_scheduler import get_encode_scheduler, summarize_timings
+
+# Chapters that may be queued or encoding before submit() blocks
+MAX_PENDING_CHAPTERS = 4
+
+
+class ChapterEncoder:
+    """Consumer stage of the conversion pipeline. Each finished chapter WAV
+    is encoded by every stage (m4a, mp3, ...) on the shared encode scheduler
+    while the next chapters are still being synthesized. Only a bounded
+    number of chapters can be pending; beyond that submit() blocks, so
+    synthesis can never run arbitrarily far ahead of encoding."""
+
+    def __init__(self, stages, scheduler=None, max_pending=MAX_PENDING_CHAPTERS):
+        # stages: list of (name, fn(index, wav_file))
+        self.stages = stages
+        self.scheduler = scheduler or get_encode_scheduler()
+        self.slots = threading.Semaphore(max(1, max_pending * len(stages)))
+        self.futures = []
+        self.cancelled = False
+
+    def _run(self, fn, index, wav_file):
+        if not self.cancelled:
+            fn(index, wav_file)
+
+    def _release(self, future):
+        self.slots.release()
+
+    def submit(self, index, wav_file):
+        for future in self.futures:
+            if future.done() and future.exception():
+                raise future.exception()
+        for name, fn in self.stages:
+            self.slots.acquire()
+            future = self.scheduler.submit(f"{name} for chapter {index}",
+                                           self._run, fn, index, wav_file)
+            future.add_done_callback(self._release)
+            self.futures.append(future)
+
+    def finish(self):
+        """Wait for every submitted chapter to be encoded; re-raises the
+        first encoding error. Returns the timing summary."""
+        for future in self.futures:
+            future.result()
+        return summarize_timings(future.timing for future in self.futures)
+
+    def cancel(self):
+        """Skip chapters that haven't started encoding and wait for the rest"""
+        self.cancelled = True
+        for future in self.futures:
+            future.exception()
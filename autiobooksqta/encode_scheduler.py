@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class EncodeTiming:
+    def __init__(self, label, queued):
+        self.label = label
+        self.queued = queued
+        self.started = None
+        self.finished = None
+
+    @property
+    def wait_seconds(self):
+        return (self.started or self.queued) - self.queued
+
+    @property
+    def run_seconds(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+def summarize_timings(timings):
+    """One-line timing report for a set of encode jobs"""
+    timings = [t for t in timings if t.finished is not None]
+    if not timings:
+        return "No encode jobs"
+    run = sum(t.run_seconds for t in timings)
+    wall = max(t.finished for t in timings) - min(t.queued for t in timings)
+    longest = max(timings, key=lambda t: t.run_seconds)
+    return (f"{len(timings)} encode jobs, {run:.1f}s of encoding in {wall:.1f}s wall "
+            f"(longest: {longest.label} {longest.run_seconds:.1f}s)")
+
+
+class EncodeScheduler:
+    """Runs ffmpeg encode jobs (m4a, mp3, ...) for every stage through one
+    pool. The number of jobs running at once is the available cores minus
+    the cores synthesis currently claims, never less than one, so encoding
+    soaks up idle cores without starving the model. Each conversion that is
+    synthesizing reserves its cores and releases them when done, so
+    concurrent conversions add up instead of overwriting each other."""
+
+    def __init__(self, cores=None):
+        self.cores = cores or available_cores()
+        self.synthesis_cores = 0
+        self.running = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=self.cores,
+                                            thread_name_prefix="encode")
+
+    @property
+    def limit(self):
+        return max(1, self.cores - self.synthesis_cores)
+
+    def reserve(self, cores):
+        """Claim cores for synthesis until release(cores)"""
+        with self._condition:
+            self.synthesis_cores += max(0, cores)
+
+    def release(self, cores):
+        with self._condition:
+            self.synthesis_cores = max(0, self.synthesis_cores - max(0, cores))
+            self._condition.notify_all()
+
+    def submit(self, label, fn, *args, **kwargs):
+        """Queue an encode job; returns a Future whose timing attribute
+        records how long it waited and ran"""
+        timing = EncodeTiming(label, time.perf_counter())
+        future = self._executor.submit(self._run, timing, fn, args, kwargs)
+        future.timing = timing
+        return future
+
+    def _run(self, timing, fn, args, kwargs):
+        with self._condition:
+            while self.running >= self.limit:
+                self._condition.wait()
+            self.running += 1
+        timing.started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timing.finished = time.perf_counter()
+            with self._condition:
+                self.running -= 1
+                self._condition.notify_all()
+            print(f"Encoded {timing.label} in {timing.run_seconds:.1f}s "
+                  f"(waited {timing.wait_seconds:.1f}s)")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_encode_scheduler():
+    """Process-wide scheduler shared by every conversion"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = EncodeScheduler()
+        return _scheduler
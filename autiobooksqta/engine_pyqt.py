@@ -1,26 +1,62 @@
 import subprocess
-import numpy as np
 import soundfile
 import ebooklib
-from ebooklib import epub
 import torch
 import io
 import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from bs4 import BeautifulSoup
 from kokoro import KPipeline
-from tempfile import NamedTemporaryFile, TemporaryDirectory
-from concurrent.futures import ThreadPoolExecutor
+from tempfile import TemporaryDirectory
 from PIL import Image, ImageTk
+from autiobooksqta.segment_cache import SegmentCache
+from autiobooksqta.text_chunker import chunk_text
+from autiobooksqta.text_extractor import extract_texts
+from autiobooksqta.phoneme_cache import PhonemeCache
+from autiobooksqta.book_cache import BookCache
+from autiobooksqta.epub_reader import LazyEpub
+from autiobooksqta.chapter_extractor import ChapterExtractor, is_extracted
+from autiobooksqta.batched_inference import (supports_phoneme_input, phonemize, synthesize_phonemes,
+                                             ThroughputMeter)
 
 SAMPLE_RATE = 24000
 
+# Maximum number of loaded pipelines (one per language code) kept alive
+PIPELINE_POOL_SIZE = 2
+
+_pipeline_pool = OrderedDict()
+_pipeline_pool_lock = threading.Lock()
+_gpu_enabled = False
+
+# Chunks gathered per batched inference window, in multiples of the batch size
+BATCH_WINDOW = 4
+
+# Synthesized audio cache shared by conversion and preview; None disables it
+_segment_cache = None
+_segment_cache_enabled = True
+
+# G2P output cache shared across voices and speeds; None disables it
+_phoneme_cache = None
+_phoneme_cache_enabled = True
+
+# Parsed books (chapter texts, metadata, cover thumbnail); None disables it
+_book_cache = None
+_book_cache_enabled = True
+
 
 def set_gpu_acceleration(enabled):
+    global _gpu_enabled
     if enabled:
         if torch.cuda.is_available():
             print('CUDA GPU available')
             torch.set_default_device('cuda')
+            if not _gpu_enabled:
+                # Pipelines loaded so far live on the CPU
+                evict_pipeline()
+                _gpu_enabled = True
         else:
             print('CUDA GPU not available. Defaulting to CPU')
 
@@ -29,8 +65,11 @@ def get_gpu_acceleration_available():
     return torch.cuda.is_available()
 
 
-def create_pipeline(lang_code):
-    """Create a KPipeline instance with proper UTF-8 encoding handling"""
+def create_pipeline(lang_code, model=True):
+    """Create a KPipeline instance with proper UTF-8 encoding handling.
+    With model=False only the text frontend is loaded. Pooled pipelines are
+    shared by the preview and conversion threads, and neither the G2P nor
+    the model is thread safe: inference_lock is held around each use."""
     import builtins
     original_open = builtins.open
 
@@ -41,29 +80,289 @@ def create_pipeline(lang_code):
 
     try:
         builtins.open = utf8_open
-        return KPipeline(lang_code=lang_code)
+        pipeline = KPipeline(lang_code=lang_code, model=model)
     finally:
         builtins.open = original_open
+    pipeline.inference_lock = threading.Lock()
+    return pipeline
+
+
+def locked_iter(lock, iterable):
+    """Iterate holding lock for each step, but not while the consumer has
+    the item, so an abandoned generator never keeps the lock"""
+    iterator = iter(iterable)
+    while True:
+        with lock:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def get_pipeline(lang_code):
+    """Return the pooled KPipeline for lang_code, loading it on first use.
+    The least recently used pipeline is dropped once the pool is full."""
+    with _pipeline_pool_lock:
+        pipeline = _pipeline_pool.get(lang_code)
+        if pipeline is not None:
+            _pipeline_pool.move_to_end(lang_code)
+            return pipeline
+        pipeline = create_pipeline(lang_code)
+        _pipeline_pool[lang_code] = pipeline
+        while len(_pipeline_pool) > PIPELINE_POOL_SIZE:
+            evicted_code, _ = _pipeline_pool.popitem(last=False)
+            print(f"Evicted pipeline for language '{evicted_code}'")
+        return pipeline
+
+
+def warm_pipeline(lang_code):
+    """Load the pipeline for lang_code ahead of time"""
+    get_pipeline(lang_code)
+
+
+def evict_pipeline(lang_code=None):
+    """Drop the pooled pipeline for lang_code, or every pipeline if None"""
+    with _pipeline_pool_lock:
+        if lang_code is None:
+            _pipeline_pool.clear()
+        else:
+            _pipeline_pool.pop(lang_code, None)
+
+
+def set_pipeline_pool_size(size):
+    """Change the pool cap, evicting least recently used pipelines if needed"""
+    global PIPELINE_POOL_SIZE
+    with _pipeline_pool_lock:
+        PIPELINE_POOL_SIZE = max(1, int(size))
+        while len(_pipeline_pool) > PIPELINE_POOL_SIZE:
+            _pipeline_pool.popitem(last=False)
+
+
+def get_segment_cache():
+    """Return the process-wide segment cache, creating it on first use"""
+    global _segment_cache
+    if _segment_cache is None and _segment_cache_enabled:
+        try:
+            _segment_cache = SegmentCache(sample_rate=SAMPLE_RATE)
+        except OSError as e:
+            print(f"Segment cache unavailable: {e}")
+            set_segment_cache_enabled(False)
+    return _segment_cache
+
+
+def set_segment_cache_enabled(enabled):
+    global _segment_cache, _segment_cache_enabled
+    _segment_cache_enabled = enabled
+    if not enabled:
+        _segment_cache = None
 
 
-def gen_audio_segments(text, voice, speed, split_pattern=r'\n+'):
+def get_phoneme_cache():
+    """Return the process-wide phoneme cache, creating it on first use"""
+    global _phoneme_cache
+    if _phoneme_cache is None and _phoneme_cache_enabled:
+        try:
+            _phoneme_cache = PhonemeCache()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Phoneme cache unavailable: {e}")
+            set_phoneme_cache_enabled(False)
+    return _phoneme_cache
+
+
+def set_phoneme_cache_enabled(enabled):
+    global _phoneme_cache, _phoneme_cache_enabled
+    _phoneme_cache_enabled = enabled
+    if not enabled:
+        _phoneme_cache = None
+
+
+def get_book_cache():
+    """Return the process-wide parsed-book cache, creating it on first use"""
+    global _book_cache
+    if _book_cache is None and _book_cache_enabled:
+        try:
+            _book_cache = BookCache()
+        except OSError as e:
+            print(f"Book cache unavailable: {e}")
+            set_book_cache_enabled(False)
+    return _book_cache
+
+
+def set_book_cache_enabled(enabled):
+    global _book_cache, _book_cache_enabled
+    _book_cache_enabled = enabled
+    if not enabled:
+        _book_cache = None
+
+
+def get_phonemes(pipeline, text):
+    """Phoneme strings for text, from the phoneme cache when possible"""
+    cache = get_phoneme_cache()
+    if cache is None:
+        return phonemize(pipeline, text)
+    return cache.get_or_compute(text, pipeline.lang_code,
+                                lambda t: phonemize(pipeline, t))
+
+
+def split_text(text, split_pattern=None):
+    """Split text into synthesis chunks. By default sentences are packed
+    into chunks of similar size; a split_pattern splits the way KPipeline
+    does instead."""
+    if split_pattern is None:
+        return chunk_text(text)
+    if not split_pattern:
+        return [text]
+    return [chunk for chunk in re.split(split_pattern, text) if chunk.strip()]
+
+
+def iter_chunk_audio(chunks, voice, speed, batch_size=1, start=0):
+    """Yield (chunk index, audio segments) for each chunk in order. Chunks
+    synthesized before are read back from the segment cache. The rest are
+    phonemized (or their phonemes read from the phoneme cache) and fed to
+    the model directly, in padded batches when batch_size > 1."""
     # a for american or b for british etc.
-    pipeline = create_pipeline(voice[0])
-    audio_segments = []
+    pipeline = get_pipeline(voice[0])
     speed = float(speed)
-    for gs, ps, audio in pipeline(text, voice=voice, speed=speed,
-                                  split_pattern=split_pattern):
-        audio_segments.append(audio)
-    return audio_segments
+    cache = get_segment_cache()
+    if not supports_phoneme_input(pipeline):
+        for index, chunk in enumerate(chunks, start=start):
+            yield index, _iter_pipeline_segments(pipeline, chunk, voice, speed, cache)
+        return
+    window = batch_size * BATCH_WINDOW
+    for offset in range(0, len(chunks), window):
+        yield from _iter_phoneme_window(pipeline, chunks[offset:offset + window], voice,
+                                        speed, batch_size, cache, start + offset)
+
+
+def _iter_pipeline_segments(pipeline, chunk, voice, speed, cache):
+    results = locked_iter(pipeline.inference_lock,
+                          pipeline(chunk, voice=voice, speed=speed, split_pattern=None))
+    if cache is None:
+        for gs, ps, audio in results:
+            if audio is not None:
+                yield as_numpy_audio(audio)
+        return
+
+    key = cache.key(chunk, voice, speed)
+    cached = cache.read(key)
+    if cached is not None:
+        yield from cached
+        return
+    with cache.writer(key) as entry:
+        for gs, ps, audio in results:
+            if audio is not None:
+                audio = as_numpy_audio(audio)
+                entry.write(audio)
+                yield audio
+
+
+def _iter_phoneme_window(pipeline, chunks, voice, speed, batch_size, cache, start):
+    readers = {}
+    phonemes, owners = [], []
+    for i, chunk in enumerate(chunks):
+        if cache is not None:
+            cached = cache.read(cache.key(chunk, voice, speed))
+            if cached is not None:
+                readers[i] = cached
+                continue
+        with pipeline.inference_lock:
+            chunk_phonemes = get_phonemes(pipeline, chunk)
+        for ps in chunk_phonemes:
+            phonemes.append(ps)
+            owners.append(i)
+
+    produced = {}
+    if phonemes:
+        with pipeline.inference_lock:
+            outputs = synthesize_phonemes(pipeline, voice, speed, phonemes, batch_size)
+        for i, audio in zip(owners, outputs):
+            produced.setdefault(i, []).append(as_numpy_audio(audio))
+
+    for i, chunk in enumerate(chunks):
+        if i in readers:
+            yield start + i, readers[i]
+            continue
+        segments = produced.get(i, [])
+        if cache is not None and segments:
+            with cache.writer(cache.key(chunk, voice, speed)) as entry:
+                for audio in segments:
+                    entry.write(audio)
+        yield start + i, segments
 
 
-def get_book(file_path, resized):
-    book = epub.read_epub(file_path)
-    chapters = find_document_chapters_and_extract_texts(book)
-    cover_image = get_cover_image(book, resized=resized)
+def iter_audio_segments(text, voice, speed, split_pattern=None, batch_size=1):
+    """Yield each audio segment as it is produced"""
+    for _, segments in iter_chunk_audio(split_text(text, split_pattern), voice, speed,
+                                        batch_size):
+        yield from segments
+
+
+def gen_audio_segments(text, voice, speed, split_pattern=None):
+    return list(iter_audio_segments(text, voice, speed, split_pattern))
+
+
+def as_numpy_audio(audio):
+    """View a CPU tensor as a numpy array without copying it"""
+    if isinstance(audio, torch.Tensor):
+        return audio.detach().cpu().numpy()
+    return audio
+
+
+def get_book(file_path, resized, parallel=None, lazy=False):
+    """(book, chapters, cover). With lazy, chapters are descriptors without
+    extracted_text, returned without reading any chapter; extract them with
+    a ChapterExtractor (see extract_in_background)."""
+    book = LazyEpub(file_path)
+    try:
+        if lazy:
+            chapters = find_document_chapters(book)
+        else:
+            chapters = find_document_chapters_and_extract_texts(book, parallel)
+        cover_image = get_cover_image(book, resized=resized)
+    except BaseException:
+        book.close()
+        raise
     return (book, chapters, cover_image)
 
 
+def cache_book(file_path, book, chapters, cover):
+    cache = get_book_cache()
+    if cache is not None:
+        try:
+            cache.put(file_path, get_title(book), get_author(book), chapters, cover)
+        except OSError as e:
+            print(f"Could not cache {file_path}: {e}")
+
+
+def load_book(file_path, lazy=False):
+    """get_book with a resized cover, served from the book cache when the
+    EPUB was opened before and hasn't changed since. Lazily loaded books are
+    cached by extract_in_background once all their text is extracted."""
+    cache = get_book_cache()
+    if cache is not None:
+        cached = cache.get(file_path)
+        if cached is not None:
+            print(f"Loaded {file_path} from the book cache")
+            return cached
+    book, chapters, cover = get_book(file_path, True, lazy=lazy)
+    if not lazy:
+        cache_book(file_path, book, chapters, cover)
+    return book, chapters, cover
+
+
+def extract_in_background(file_path, book, chapters, cover, on_extracted=None):
+    """Start extracting the text of chapters from load_book(lazy=True) on a
+    background thread and return the ChapterExtractor. When the last chapter
+    is extracted the book is stored in the book cache."""
+    already_cached = all(is_extracted(chapter) for chapter in chapters)
+    extractor = ChapterExtractor(
+        chapters, on_extracted,
+        on_finished=None if already_cached else lambda: cache_book(file_path, book, chapters, cover)
+    )
+    return extractor.start()
+
+
 def is_valid_chapter(chapter):
     print(chapter.get_type())
     if chapter.get_type() == ebooklib.ITEM_DOCUMENT:
@@ -74,62 +373,97 @@ def is_valid_chapter(chapter):
     return False
 
 
-def find_document_chapters_and_extract_texts(book):
+def spine_items(book):
+    """Items in reading (spine) order, or in manifest order if the book has
+    no usable spine"""
+    items = []
+    for entry in getattr(book, 'spine', []):
+        item = book.get_item_with_id(entry[0] if isinstance(entry, tuple) else entry)
+        if item is not None:
+            items.append(item)
+    return items or list(book.get_items())
+
+
+def find_document_chapters(book):
+    """Every ITEM_DOCUMENT in reading order, without reading its content"""
+    return [chapter for chapter in spine_items(book) if is_valid_chapter(chapter)]
+
+
+def find_document_chapters_and_extract_texts(book, parallel=None):
     """Returns every chapter that is an ITEM_DOCUMENT
-    and enriches each chapter with extracted_text."""
+    and enriches each chapter with extracted_text.
+    Large books are extracted in a process pool (see extract_texts); the
+    raw documents are handed over unparsed so all parsing runs there."""
     document_chapters = []
-    for chapter in book.get_items():
-        if not is_valid_chapter(chapter):
-            continue
+    documents = []
+    for chapter in find_document_chapters(book):
         try:
-            xml = chapter.get_body_content()
+            xml = chapter.get_content()
         except:
-            try:
-                xml = chapter.get_content()
-            except:
-                continue
-        soup = BeautifulSoup(xml, features='lxml')
-        chapter_text = ''
-        html_content_tags = ['title', 'p', 'h1', 'h2', 'h3', 'h4', 'li']
-        for child in soup.find_all(html_content_tags):
-            inner_text = child.text.strip() if child.text else ""
-            if inner_text:
-                chapter_text += inner_text + '\n'
-        chapter.extracted_text = chapter_text
+            continue
         document_chapters.append(chapter)
+        documents.append(xml)
+    for chapter, text in zip(document_chapters, extract_texts(documents, parallel)):
+        chapter.extracted_text = text
     return document_chapters
 
 
+# ffmpeg codec arguments per output format
+M4A_CODEC_ARGS = ['-c:a', 'aac', '-b:a', '64k']
+
+
+def mp3_codec_args(bitrate='128k'):
+    return ['-codec:a', 'libmp3lame', '-b:a', bitrate]
+
+
 def convert_wav_to_m4a(wav_file_path, m4a_file_path):
     subprocess.run([
         'ffmpeg',
+        '-y',
         '-i', wav_file_path,
-        '-c:a', 'aac',
-        '-b:a', '64k',
+        *M4A_CODEC_ARGS,
         m4a_file_path
     ])
 
 
-def create_m4b(chapter_files, filename, cover_image):
-    with TemporaryDirectory() as tempdir:
+def convert_wav_to_mp3(wav_file_path, mp3_file_path, bitrate='128k'):
+    try:
+        subprocess.run([
+            "ffmpeg",
+            "-i", wav_file_path,
+            *mp3_codec_args(bitrate),
+            "-y",  # Overwrite output file if it exists
+            mp3_file_path
+        ], check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error converting {wav_file_path} to MP3: {e}")
+        raise Exception(f"MP3 conversion failed: {e}")
+
+
+def convert_wav_to_outputs(wav_file_path, outputs):
+    """Decode the WAV once and encode every rendition from the same ffmpeg
+    process. outputs is a list of (output path, codec args)."""
+    args = ['ffmpeg', '-y', '-i', wav_file_path]
+    for output_path, codec_args in outputs:
+        args += [*codec_args, output_path]
+    try:
+        subprocess.run(args, check=True, capture_output=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error encoding {wav_file_path}: {e}")
+        raise Exception(f"Encoding failed: {e}")
+
+
+def mux_m4b(m4a_files, filename, cover_image, index_path, workspace=None):
+    """Concatenate already encoded m4a chapters into one m4b (no encoding).
+    The concat list and cover are written into the job's workspace, so
+    concurrent conversions never share a file."""
+    with TemporaryDirectory(dir=workspace) as tempdir:
         # Create concat file
         concat_file = os.path.join(tempdir, 'concat.txt')
         with open(concat_file, 'w') as file:
-            for wav_file in chapter_files:
-                m4a_file_path = os.path.join(tempdir, Path(wav_file).stem + '.m4a')
+            for m4a_file_path in m4a_files:
                 file.write(f"file '{m4a_file_path}'\n")
 
-        # Convert the wav files to m4a in parallel
-        with ThreadPoolExecutor() as tpe:
-            futures = []
-            for wav_file in chapter_files:
-                m4a_file_path = os.path.join(tempdir, Path(wav_file).stem + '.m4a')
-                futures.append(tpe.submit(convert_wav_to_m4a, wav_file, m4a_file_path))
-
-        # Wait for all conversions to finish
-        for future in futures:
-            future.result()
-
         # Debug: Check if all expected m4a files exist before merging
         print("Checking files before merging:")
         with open(concat_file, "r") as f:
@@ -143,11 +477,11 @@ def create_m4b(chapter_files, filename, cover_image):
         # FFmpeg arguments for cover image if present
         cover_image_args = []
         if cover_image:
-            cover_image_file = NamedTemporaryFile("wb", delete=False)
-            cover_image_file.write(cover_image)
-            cover_image_file.close()  # close it
+            cover_image_file = os.path.join(tempdir, 'cover')
+            with open(cover_image_file, 'wb') as f:
+                f.write(cover_image)
             cover_image_args = [
-                "-i", cover_image_file.name,
+                "-i", cover_image_file,
                 '-disposition:v', 'attached_pic'
             ]
 
@@ -159,32 +493,38 @@ def create_m4b(chapter_files, filename, cover_image):
             '-y',
             '-f', 'concat',
             '-i', concat_file,
-            '-i', 'chapters.txt',
+            '-i', index_path,
             *cover_image_args,
             '-c', 'copy',
             final_filename
         ], check=True)
 
 
-def probe_duration(file_name):
-    args = ['ffprobe', '-i', file_name, '-show_entries', 'format=duration',
-            '-v', 'quiet', '-of', 'default=noprint_wrappers=1:nokey=1']
-    proc = subprocess.run(args, capture_output=True, text=True, check=True)
-    return float(proc.stdout.strip())
+def wav_sample_count(file_name):
+    """Sample count from the WAV header alone, without decoding or ffprobe"""
+    return soundfile.info(file_name).frames
 
 
-def create_index_file(title, creator, chapter_mp3_files):
-    with open("chapters.txt", "w") as f:
+def write_ffmetadata(index_path, title, creator, chapter_samples):
+    """Write an FFMETADATA chapter index from exact per-chapter sample counts"""
+    with open(index_path, "w", encoding='utf-8') as f:
         f.write(f";FFMETADATA1\ntitle={title}\nartist={creator}\n\n")
-        start = 0
-        i = 0
-        for c in chapter_mp3_files:
-            duration = probe_duration(c)
-            end = start + (int)(duration * 1000)
+        total = 0
+        for i, samples in enumerate(chapter_samples):
+            start = total * 1000 // SAMPLE_RATE
+            total += samples
+            end = total * 1000 // SAMPLE_RATE
             f.write(f"[CHAPTER]\nTIMEBASE=1/1000\nSTART={start}\nEND={end}" +
                     f"\ntitle=Chapter {i}\n\n")
-            i += 1
-            start = end
+
+
+def create_index_file(title, creator, chapter_files, index_path, chapter_samples=None):
+    """Build the chapter index from the sample counts synthesis reported.
+    Chapters without a known count fall back to reading the WAV header."""
+    chapter_samples = chapter_samples or [None] * len(chapter_files)
+    samples = [count if count is not None else wav_sample_count(c)
+               for c, count in zip(chapter_files, chapter_samples)]
+    write_ffmetadata(index_path, title, creator, samples)
 
 
 def resized_image(item):
@@ -232,16 +572,96 @@ def get_cover_image(book, resized):
     return None
 
 
+def open_wav_for_resume(filename, frames):
+    """Reopen a partially written WAV, cut back to `frames` samples and
+    positioned at the end. Returns None if it can't be resumed."""
+    try:
+        f = soundfile.SoundFile(filename, 'r+')
+    except RuntimeError:
+        return None
+    if f.frames < frames:
+        f.close()
+        return None
+    f.truncate(frames)
+    f.seek(0, soundfile.SEEK_END)
+    return f
+
+
 def convert_text_to_wav_file(text, voice, speed, filename,
-                             split_pattern=r'\n\n\n'):
-    if Path(filename).exists():
-        Path(filename).unlink()
-    audio = gen_audio_segments(text, voice, speed, split_pattern)
-    if audio:
-        audio = np.concatenate(audio)
-        soundfile.write(filename, audio, SAMPLE_RATE)
-        return True
-    return False
+                             split_pattern=None, checkpoint=None, batch_size=1):
+    """Stream each segment straight into the WAV file as it is produced, so
+    memory use doesn't grow with chapter length. With a checkpoint, progress
+    is recorded between chunks and a previous partial run is continued.
+    Returns the number of samples in the file (0 if nothing was written)."""
+    start_chunk, samples_written = 0, 0
+    f = None
+    if checkpoint is not None and checkpoint.start_chunk and Path(filename).exists():
+        f = open_wav_for_resume(filename, checkpoint.start_frames)
+        if f is not None:
+            start_chunk, samples_written = checkpoint.start_chunk, checkpoint.start_frames
+            print(f"Resuming {filename} at chunk {start_chunk}")
+    if f is None:
+        if Path(filename).exists():
+            Path(filename).unlink()
+        f = soundfile.SoundFile(filename, 'w', samplerate=SAMPLE_RATE,
+                                channels=1, subtype='PCM_16')
+    chunks = split_text(text, split_pattern)
+    meter = ThroughputMeter(SAMPLE_RATE)
+    try:
+        for index, segments in iter_chunk_audio(chunks[start_chunk:], voice, speed,
+                                                batch_size, start=start_chunk):
+            for audio in segments:
+                f.write(audio)
+                samples_written += len(audio)
+                meter.add(len(audio))
+            if checkpoint is not None and checkpoint.due():
+                # Closing finalizes the WAV header so the checkpoint is valid
+                f.close()
+                checkpoint(index + 1, samples_written)
+                reopened = open_wav_for_resume(filename, samples_written)
+                if reopened is None:
+                    raise RuntimeError(f"Could not reopen {filename} after checkpoint")
+                f = reopened
+    finally:
+        f.close()
+    if samples_written:
+        print(f"{Path(filename).name}: {meter.summary()}")
+        return samples_written
+    Path(filename).unlink()
+    return 0
+
+
+def concatenate_wavs(wav_files, filename):
+    """Join 16-bit WAVs end to end into filename. Samples are copied as
+    integers, so the result is bit-identical to writing them in one pass.
+    Returns the number of samples written."""
+    samples = 0
+    with soundfile.SoundFile(filename, 'w', samplerate=SAMPLE_RATE,
+                             channels=1, subtype='PCM_16') as out:
+        for wav_file in wav_files:
+            for block in soundfile.blocks(wav_file, blocksize=65536, dtype='int16'):
+                out.write(block)
+                samples += len(block)
+    return samples
+
+
+def init_synthesis_worker(use_gpu, lang_code, num_threads, use_segment_cache=True):
+    """Initializer for synthesis worker processes: limit torch threads so
+    workers don't oversubscribe the cores, then load the pipeline once"""
+    torch.set_num_threads(max(1, num_threads))
+    set_segment_cache_enabled(use_segment_cache)
+    set_gpu_acceleration(use_gpu)
+    warm_pipeline(lang_code)
+
+
+def synthesize_chapter(text, voice, speed, filename, checkpoint=None, batch_size=1):
+    """Process pool entry point; returns (filename, sample count) if audio
+    was written, otherwise None"""
+    samples = convert_text_to_wav_file(text, voice, speed, filename, checkpoint=checkpoint,
+                                       batch_size=batch_size)
+    if samples:
+        return filename, samples
+    return None
 
 
 def get_title(book):
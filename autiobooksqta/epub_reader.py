@@ -0,0 +1,146 @@
+import posixpath
+import threading
+import zipfile
+from urllib.parse import unquote
+
+import ebooklib
+from lxml import etree
+
+CONTAINER_PATH = 'META-INF/container.xml'
+
+NAMESPACES = {
+    'container': 'urn:oasis:names:tc:opendocument:xmlns:container',
+    'opf': 'http://www.idpf.org/2007/opf',
+    'dc': 'http://purl.org/dc/elements/1.1/'
+}
+
+
+class LazyItem:
+    """A manifest entry. Offers the ebooklib item methods the app uses, but
+    its content stays in the zip until asked for."""
+
+    def __init__(self, reader, item_id, file_name, zip_path, media_type, properties,
+                 is_cover=False):
+        self.reader = reader
+        self.id = item_id
+        # Relative to the OPF, as ebooklib names items
+        self.file_name = file_name
+        self.zip_path = zip_path
+        self.media_type = media_type
+        self.properties = properties
+        self.is_cover = is_cover
+
+    def get_id(self):
+        return self.id
+
+    def get_name(self):
+        return self.file_name
+
+    def get_type(self):
+        if self.is_cover:
+            return ebooklib.ITEM_COVER
+        if self.media_type == 'application/xhtml+xml':
+            return ebooklib.ITEM_DOCUMENT
+        ext = posixpath.splitext(self.file_name)[1].lower()
+        for item_type, extensions in ebooklib.EXTENSIONS.items():
+            if ext in extensions:
+                return item_type
+        return ebooklib.ITEM_UNKNOWN
+
+    def get_content(self):
+        return self.reader.read(self.zip_path)
+
+    def get_body_content(self):
+        """The <body> element as bytes, like ebooklib's EpubHtml"""
+        content = self.get_content()
+        root = etree.fromstring(content, etree.HTMLParser(encoding='utf-8')) if content.strip() else None
+        body = root.find('body') if root is not None else None
+        if body is None:
+            return content
+        return etree.tostring(body, encoding='utf-8')
+
+
+class LazyEpub:
+    """Reads an EPUB's OPF once to index the manifest, spine and metadata,
+    and reads item content from the zip only when it is asked for. Unlike
+    epub.read_epub, fonts and images that are never used are never loaded,
+    so memory follows the text read, not the archive size. Offers the
+    ebooklib book methods the app uses. The archive stays open until
+    close(), or the end of a with block."""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._zip = zipfile.ZipFile(file_path)
+        self._lock = threading.Lock()
+        try:
+            self._read_package()
+        except BaseException:
+            self._zip.close()
+            raise
+
+    def _read_package(self):
+        container = etree.fromstring(self._zip.read(CONTAINER_PATH))
+        self.opf_path = container.find('.//container:rootfile', NAMESPACES).get('full-path')
+        opf = etree.fromstring(self._zip.read(self.opf_path))
+        opf_dir = posixpath.dirname(self.opf_path)
+
+        self.metadata = {}
+        metadata = opf.find('opf:metadata', NAMESPACES)
+        cover_id = None
+        if metadata is not None:
+            for element in metadata:
+                if not isinstance(element.tag, str):
+                    continue
+                tag = etree.QName(element)
+                if tag.namespace == NAMESPACES['dc']:
+                    self.metadata.setdefault(tag.localname, []).append(
+                        ((element.text or '').strip(), dict(element.attrib)))
+                elif tag.localname == 'meta' and element.get('name') == 'cover':
+                    cover_id = element.get('content')
+
+        self.items = []
+        self._by_id = {}
+        for element in opf.iterfind('opf:manifest/opf:item', NAMESPACES):
+            item_id = element.get('id')
+            properties = (element.get('properties') or '').split()
+            file_name = unquote(element.get('href', ''))
+            zip_path = posixpath.normpath(posixpath.join(opf_dir, file_name))
+            media_type = element.get('media-type', '')
+            is_cover = ((item_id == cover_id or 'cover-image' in properties)
+                        and media_type.startswith('image/'))
+            item = LazyItem(self, item_id, file_name, zip_path, media_type, properties, is_cover)
+            self.items.append(item)
+            self._by_id[item_id] = item
+
+        self.spine = [(element.get('idref'), element.get('linear', 'yes'))
+                      for element in opf.iterfind('opf:spine/opf:itemref', NAMESPACES)]
+
+    def read(self, zip_path):
+        # ZipFile reads share one file position
+        with self._lock:
+            return self._zip.read(zip_path)
+
+    def get_metadata(self, namespace, name):
+        if namespace != 'DC':
+            return []
+        return self.metadata.get(name, [])
+
+    def get_items(self):
+        return iter(self.items)
+
+    def get_items_of_type(self, item_type):
+        return (item for item in self.items if item.get_type() == item_type)
+
+    def get_item_with_id(self, item_id):
+        return self._by_id.get(item_id)
+
+    def close(self):
+        # Not while a read holds the archive
+        with self._lock:
+            self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import soundfile
+
+JOURNAL_FILE = "journal.json"
+
+# Minimum seconds between in-chapter checkpoints
+CHECKPOINT_INTERVAL = 10.0
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file and rename it so a crash never leaves a
+    half-written journal behind"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def wav_frames(wav_file):
+    """Frame count from the WAV header, or None if the file is unusable"""
+    try:
+        return soundfile.info(wav_file).frames
+    except (RuntimeError, OSError):
+        return None
+
+
+class ChapterCheckpoint:
+    """Records how far into a chapter synthesis got. Passed to
+    convert_text_to_wav_file, including in worker processes, so it only
+    holds plain data."""
+
+    def __init__(self, journal_dir, index, text_digest, start_chunk=0, start_frames=0):
+        self.journal_dir = journal_dir
+        self.index = index
+        self.text_digest = text_digest
+        self.start_chunk = start_chunk
+        self.start_frames = start_frames
+        self.last_saved = time.monotonic()
+
+    @property
+    def path(self):
+        return os.path.join(self.journal_dir, f"chapter_{self.index}.json")
+
+    def due(self):
+        return time.monotonic() - self.last_saved >= CHECKPOINT_INTERVAL
+
+    def __call__(self, chunk, frames):
+        """Save that the first `chunk` chunks (`frames` samples) are on disk"""
+        write_json_atomic(self.path, {
+            'text_hash': self.text_digest,
+            'chunk': chunk,
+            'frames': frames
+        })
+        self.last_saved = time.monotonic()
+
+
+def load_chapter_checkpoint(journal_dir, index, text):
+    """Checkpoint for a chapter, starting where the last attempt stopped"""
+    digest = text_hash(text)
+    checkpoint = ChapterCheckpoint(journal_dir, index, digest)
+    saved = read_json(checkpoint.path)
+    if saved and saved.get('text_hash') == digest:
+        checkpoint.start_chunk = saved['chunk']
+        checkpoint.start_frames = saved['frames']
+    return checkpoint
+
+
+class ConversionJournal:
+    """Job journal kept in the output folder. Records finished chapter WAVs
+    and in-chapter offsets so an interrupted conversion can pick up at the
+    first incomplete unit. Any change to the job settings starts over."""
+
+    def __init__(self, output_folder, base_filename, settings, resume=True):
+        self.journal_dir = os.path.join(output_folder, f"{base_filename}.journal")
+        self.path = os.path.join(self.journal_dir, JOURNAL_FILE)
+        self.settings = settings
+
+        data = read_json(self.path) if resume else None
+        if not data or data.get('settings') != settings:
+            if os.path.exists(self.journal_dir):
+                shutil.rmtree(self.journal_dir, ignore_errors=True)
+            data = {'settings': settings, 'chapters': {}}
+        else:
+            print(f"Resuming conversion from journal: {self.path}")
+        self.chapters = data['chapters']
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.save()
+
+    def save(self):
+        write_json_atomic(self.path, {'settings': self.settings, 'chapters': self.chapters})
+
+    def chapter_complete(self, index, text, wav_file):
+        """True if the chapter was finished before and its WAV is intact"""
+        entry = self.chapters.get(str(index))
+        if not entry or entry['text_hash'] != text_hash(text):
+            return False
+        if os.path.abspath(wav_file) != entry['wav_file']:
+            return False
+        return wav_frames(wav_file) == entry['frames']
+
+    def mark_chapter_done(self, index, text, wav_file, frames=None):
+        self.chapters[str(index)] = {
+            'text_hash': text_hash(text),
+            'wav_file': os.path.abspath(wav_file),
+            'frames': frames if frames is not None else wav_frames(wav_file)
+        }
+        self.save()
+        checkpoint_path = os.path.join(self.journal_dir, f"chapter_{index}.json")
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def chapter_checkpoint(self, index, text):
+        """Checkpoint for a chapter, starting where the last run stopped"""
+        return load_chapter_checkpoint(self.journal_dir, index, text)
+
+    def finish(self):
+        """Remove the journal once the whole job has completed"""
+        shutil.rmtree(self.journal_dir, ignore_errors=True)
@@ -0,0 +1,284 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_QUEUE_PATH = os.path.join(os.path.expanduser("~"), ".audiobooks_cache", "jobs.sqlite")
+
+# Seconds without a lease renewal before a claimed chapter is re-queued
+CLAIM_TIMEOUT = 600.0
+
+# Attempts per chapter before it (and its book) is marked failed
+MAX_ATTEMPTS = 3
+
+PENDING = 'pending'
+RUNNING = 'running'
+ASSEMBLING = 'assembling'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueuedChapter:
+    def __init__(self, row):
+        (self.book_id, self.index, self.text, self.wav_file,
+         self.attempts, settings, self.file_path) = row
+        self.settings = json.loads(settings)
+
+
+class QueuedBook:
+    def __init__(self, row):
+        self.book_id, self.file_path, settings = row
+        self.settings = json.loads(settings)
+
+
+class JobQueue:
+    """Durable queue of books and their chapters in a local SQLite file.
+    Chapters move pending -> running -> done (or failed after MAX_ATTEMPTS);
+    a book is assembled once all its chapters are done. Claims are single
+    transactions, so any number of worker processes on the host can drain
+    the queue together, and a chapter or assembly claim whose lease isn't
+    renewed within claim_timeout seconds is handed to another worker."""
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, claim_timeout=CLAIM_TIMEOUT):
+        self.path = path
+        self.claim_timeout = claim_timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS books ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, file_path TEXT NOT NULL, "
+                "settings TEXT NOT NULL, state TEXT NOT NULL, worker TEXT, claimed_at REAL, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, error TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chapters ("
+                "book_id INTEGER NOT NULL, idx INTEGER NOT NULL, text TEXT NOT NULL, "
+                "wav_file TEXT NOT NULL, state TEXT NOT NULL, worker TEXT, claimed_at REAL, "
+                "started_at REAL, finished_at REAL, seconds REAL, samples INTEGER, "
+                "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, cost REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (book_id, idx))"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(chapters)")]
+            if 'cost' not in columns:
+                # Queues created before chapters were scheduled by cost
+                conn.execute("ALTER TABLE chapters ADD COLUMN cost REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS chapters_state ON chapters (state)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit; every write below runs in an explicit transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE takes the write lock up front, so a select followed
+        by an update can't race another worker's claim"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def add_book(self, file_path, settings, chapter_jobs, costs=None):
+        """Queue a book. chapter_jobs is a list of (chapter index, text, WAV
+        path); a book's chapters are claimed in order of descending cost.
+        Returns the book id."""
+        costs = costs or [0] * len(chapter_jobs)
+        with self._transaction() as conn:
+            book_id = conn.execute(
+                "INSERT INTO books (file_path, settings, state, created_at) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(file_path), json.dumps(settings), PENDING, time.time())
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO chapters (book_id, idx, text, wav_file, state, cost) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(book_id, i, text, os.path.abspath(wav_file), PENDING, cost)
+                 for (i, text, wav_file), cost in zip(chapter_jobs, costs)]
+            )
+        return book_id
+
+    def _requeue_expired(self, conn, now):
+        """Hand expired claims back to the queue. A chapter whose claims
+        keep expiring (its worker crashes on it) fails after MAX_ATTEMPTS,
+        and its book with it."""
+        expired = now - self.claim_timeout
+        crashed = conn.execute(
+            "SELECT book_id, idx FROM chapters WHERE state = ? AND claimed_at < ? "
+            "AND attempts >= ?",
+            (RUNNING, expired, MAX_ATTEMPTS)
+        ).fetchall()
+        for book_id, index in crashed:
+            error = f"Claim expired {MAX_ATTEMPTS} times; the worker may have crashed"
+            conn.execute(
+                "UPDATE chapters SET state = ?, worker = NULL, finished_at = ?, error = ? "
+                "WHERE book_id = ? AND idx = ?",
+                (FAILED, now, error, book_id, index)
+            )
+            conn.execute(
+                "UPDATE books SET state = ?, finished_at = ?, error = ? WHERE id = ?",
+                (FAILED, now, f"Chapter {index}: {error}", book_id)
+            )
+        conn.execute(
+            "UPDATE chapters SET state = ?, worker = NULL WHERE state = ? AND claimed_at < ?",
+            (PENDING, RUNNING, expired)
+        )
+        conn.execute(
+            "UPDATE books SET state = ?, worker = NULL WHERE state = ? AND claimed_at < ?",
+            (RUNNING, ASSEMBLING, expired)
+        )
+
+    def claim_chapter(self, worker_id):
+        """Atomically claim the next pending chapter, or None"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT c.book_id, c.idx, c.text, c.wav_file, c.attempts, b.settings, b.file_path "
+                "FROM chapters c JOIN books b ON b.id = c.book_id "
+                "WHERE c.state = ? AND b.state IN (?, ?) "
+                "ORDER BY c.book_id, c.cost DESC, c.idx LIMIT 1",
+                (PENDING, PENDING, RUNNING)
+            ).fetchone()
+            if row is None:
+                return None
+            chapter = QueuedChapter(row)
+            chapter.attempts += 1
+            conn.execute(
+                "UPDATE chapters SET state = ?, worker = ?, claimed_at = ?, started_at = ?, "
+                "attempts = ? WHERE book_id = ? AND idx = ?",
+                (RUNNING, worker_id, now, now, chapter.attempts, chapter.book_id, chapter.index)
+            )
+            conn.execute(
+                "UPDATE books SET state = ?, started_at = COALESCE(started_at, ?) "
+                "WHERE id = ? AND state = ?",
+                (RUNNING, now, chapter.book_id, PENDING)
+            )
+        return chapter
+
+    def renew_chapter(self, book_id, index, worker_id):
+        """Extend a chapter claim. Returns False if the claim was lost."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE chapters SET claimed_at = ? WHERE book_id = ? AND idx = ? "
+                "AND state = ? AND worker = ?",
+                (time.time(), book_id, index, RUNNING, worker_id)
+            ).rowcount == 1
+
+    def complete_chapter(self, book_id, index, worker_id, samples):
+        """Mark a chapter done. Returns False if the worker no longer holds
+        the claim."""
+        now = time.time()
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE chapters SET state = ?, finished_at = ?, seconds = ? - started_at, "
+                "samples = ?, error = NULL WHERE book_id = ? AND idx = ? AND state = ? "
+                "AND worker = ?",
+                (DONE, now, now, samples, book_id, index, RUNNING, worker_id)
+            ).rowcount == 1
+
+    def fail_chapter(self, book_id, index, worker_id, error):
+        """Record a failed attempt. The chapter is retried until MAX_ATTEMPTS,
+        after which it and its book are marked failed."""
+        now = time.time()
+        with self._transaction() as conn:
+            attempts = conn.execute(
+                "SELECT attempts FROM chapters WHERE book_id = ? AND idx = ?",
+                (book_id, index)
+            ).fetchone()[0]
+            state = FAILED if attempts >= MAX_ATTEMPTS else PENDING
+            conn.execute(
+                "UPDATE chapters SET state = ?, worker = NULL, finished_at = ?, error = ? "
+                "WHERE book_id = ? AND idx = ? AND worker = ?",
+                (state, now, str(error), book_id, index, worker_id)
+            )
+            if state == FAILED:
+                conn.execute(
+                    "UPDATE books SET state = ?, finished_at = ?, error = ? WHERE id = ?",
+                    (FAILED, now, f"Chapter {index}: {error}", book_id)
+                )
+
+    def claim_assembly(self, worker_id):
+        """Atomically claim a book whose chapters are all done, or None"""
+        now = time.time()
+        with self._transaction() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT id, file_path, settings FROM books b WHERE state = ? AND NOT EXISTS "
+                "(SELECT 1 FROM chapters c WHERE c.book_id = b.id AND c.state != ?) "
+                "ORDER BY id LIMIT 1",
+                (RUNNING, DONE)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE books SET state = ?, worker = ?, claimed_at = ? WHERE id = ?",
+                (ASSEMBLING, worker_id, now, row[0])
+            )
+        return QueuedBook(row)
+
+    def renew_assembly(self, book_id, worker_id):
+        """Extend an assembly claim. Returns False if the claim was lost."""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE books SET claimed_at = ? WHERE id = ? AND state = ? AND worker = ?",
+                (time.time(), book_id, ASSEMBLING, worker_id)
+            ).rowcount == 1
+
+    def book_chapters(self, book_id):
+        """(chapter index, text, WAV path, samples) for every chapter"""
+        return self._connection().execute(
+            "SELECT idx, text, wav_file, samples FROM chapters WHERE book_id = ? ORDER BY idx",
+            (book_id,)
+        ).fetchall()
+
+    def finish_book(self, book_id, error=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE books SET state = ?, finished_at = ?, error = ? WHERE id = ?",
+                (FAILED if error else DONE, time.time(), error, book_id)
+            )
+
+    def unfinished_books(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM books WHERE state NOT IN (?, ?)", (DONE, FAILED)
+        ).fetchone()[0]
+
+    def retry_failed(self):
+        """Send failed books and chapters back to the queue"""
+        with self._transaction() as conn:
+            conn.execute("UPDATE chapters SET state = ?, attempts = 0, error = NULL WHERE state = ?",
+                         (PENDING, FAILED))
+            conn.execute("UPDATE books SET state = ?, error = NULL, finished_at = NULL "
+                         "WHERE state = ?", (RUNNING, FAILED))
+
+    def status(self):
+        """Book and chapter counts per state, and chapter timings"""
+        conn = self._connection()
+        books = dict(conn.execute("SELECT state, COUNT(*) FROM books GROUP BY state").fetchall())
+        chapters = dict(conn.execute("SELECT state, COUNT(*) FROM chapters GROUP BY state").fetchall())
+        count, total, longest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(seconds), 0), COALESCE(MAX(seconds), 0) "
+            "FROM chapters WHERE state = ?", (DONE,)
+        ).fetchone()
+        return {
+            'books': books,
+            'chapters': chapters,
+            'chapter_seconds': total,
+            'mean_chapter_seconds': total / count if count else 0.0,
+            'longest_chapter_seconds': longest
+        }
@@ -0,0 +1,112 @@
+import os
+import subprocess
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from autiobooksqta.engine_pyqt import SAMPLE_RATE, iter_audio_segments, as_numpy_audio, write_ffmetadata
+
+
+def pcm16_bytes(audio):
+    """Float audio in [-1, 1] as little-endian 16-bit PCM, the same scaling
+    soundfile applies when writing PCM_16 WAVs"""
+    audio = np.clip(as_numpy_audio(audio), -1.0, 1.0)
+    return (audio * 32767).astype('<i2').tobytes()
+
+
+class PcmPipeEncoder:
+    """An ffmpeg process encoding raw mono PCM written to its stdin"""
+
+    def __init__(self, output_args):
+        self.process = subprocess.Popen([
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1', '-i', 'pipe:0',
+            *output_args
+        ], stdin=subprocess.PIPE)
+        self.samples = 0
+
+    def write(self, pcm, samples):
+        self.process.stdin.write(pcm)
+        self.samples += samples
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise Exception(f"ffmpeg exited with code {self.process.returncode}")
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+
+def stream_text_to_encoders(text, voice, speed, encoders, batch_size=1):
+    """Synthesize text and feed every segment to each encoder as it is
+    produced. Returns the number of samples written."""
+    samples = 0
+    for audio in iter_audio_segments(text, voice, speed, batch_size=batch_size):
+        pcm = pcm16_bytes(audio)
+        for encoder in encoders:
+            encoder.write(pcm, len(audio))
+        samples += len(audio)
+    return samples
+
+
+class StreamingM4bWriter:
+    """Builds an m4b from a single long-lived AAC encoder. Chapters are
+    appended as PCM is streamed in, and chapter markers are computed from
+    sample counts, so no per-chapter WAV or m4a is ever written. The AAC
+    stream goes to one intermediate m4a in a temporary directory beside the
+    m4b, on the same disk as the output rather than in the system temp
+    dir; closing remuxes it with the chapter index and cover (no
+    re-encoding)."""
+
+    def __init__(self, filename, title, creator, cover_image=None, bitrate='64k'):
+        self.filename = filename
+        self.title = title
+        self.creator = creator
+        self.cover_image = cover_image
+        self.tempdir = TemporaryDirectory(prefix='.autiobooks_stream_',
+                                          dir=os.path.dirname(os.path.abspath(filename)))
+        self.audio_path = os.path.join(self.tempdir.name, 'audiobook.m4a')
+        self.encoder = PcmPipeEncoder(['-c:a', 'aac', '-b:a', bitrate, self.audio_path])
+        self.chapter_samples = []
+
+    def write(self, pcm, samples):
+        self.encoder.write(pcm, samples)
+
+    def add_chapter(self, samples):
+        """Record that the last `samples` samples written form one chapter"""
+        if samples:
+            self.chapter_samples.append(samples)
+
+    def close(self):
+        try:
+            self.encoder.close()
+            index_file = os.path.join(self.tempdir.name, 'chapters.txt')
+            write_ffmetadata(index_file, self.title, self.creator, self.chapter_samples)
+
+            cover_image_args = []
+            if self.cover_image:
+                cover_image_file = os.path.join(self.tempdir.name, 'cover')
+                with open(cover_image_file, 'wb') as f:
+                    f.write(self.cover_image)
+                cover_image_args = [
+                    "-i", cover_image_file,
+                    '-disposition:v', 'attached_pic'
+                ]
+
+            subprocess.run([
+                'ffmpeg',
+                '-y',
+                '-i', self.audio_path,
+                '-i', index_file,
+                *cover_image_args,
+                '-c', 'copy',
+                self.filename
+            ], check=True)
+        finally:
+            self.tempdir.cleanup()
+
+    def abort(self):
+        self.encoder.kill()
+        self.tempdir.cleanup()
@@ -1,7 +1,10 @@
 import os
 
 from PyQt6.QtWidgets import QVBoxLayout, QDialog, QHBoxLayout, QGroupBox, QLineEdit, QPushButton, QCheckBox, \
-    QGridLayout, QLabel, QComboBox, QDialogButtonBox, QFileDialog
+    QGridLayout, QLabel, QComboBox, QDialogButtonBox, QFileDialog, QSpinBox, QListWidget, \
+    QAbstractItemView
+
+from autiobooksqta.voices_lang import voices_emojified, deemojify_voice
 
 
 class OutputOptionsDialog(QDialog):
@@ -39,6 +42,11 @@ class OutputOptionsDialog(QDialog):
         self.create_m4b_checkbox.setChecked(True)
         format_layout.addWidget(self.create_m4b_checkbox)
 
+        # Single-pass M4B: synthesis streams into one encoder, no WAV files
+        self.stream_m4b_checkbox = QCheckBox("Stream M4B in a single pass (no chapter WAVs, no resume)")
+        self.stream_m4b_checkbox.setChecked(False)
+        format_layout.addWidget(self.stream_m4b_checkbox)
+
         # MP3 option
         self.create_mp3_checkbox = QCheckBox("Also create MP3 files")
         self.create_mp3_checkbox.setChecked(True)
@@ -67,6 +75,43 @@ class OutputOptionsDialog(QDialog):
         self.keep_wav_checkbox.setVisible(False)
         format_layout.addWidget(self.keep_wav_checkbox)
 
+        # Additional narrators rendered in the same job
+        voices_group = QGroupBox("Additional Voices")
+        voices_layout = QVBoxLayout(voices_group)
+        voices_layout.addWidget(QLabel("Also render the book with (each voice gets its own folder):"))
+        self.extra_voices_list = QListWidget()
+        self.extra_voices_list.addItems(voices_emojified)
+        self.extra_voices_list.setSelectionMode(QAbstractItemView.SelectionMode.MultiSelection)
+        self.extra_voices_list.setMaximumHeight(120)
+        voices_layout.addWidget(self.extra_voices_list)
+
+        # Performance options
+        performance_group = QGroupBox("Performance")
+        performance_layout = QGridLayout(performance_group)
+
+        # Number of processes synthesizing chapters at the same time
+        performance_layout.addWidget(QLabel("Synthesis processes:"), 0, 0)
+        self.synthesis_workers_spin = QSpinBox()
+        self.synthesis_workers_spin.setRange(1, os.cpu_count() or 1)
+        self.synthesis_workers_spin.setValue(1)
+        self.synthesis_workers_spin.setToolTip(
+            "Chapters are converted in parallel, each process loading its own voice model")
+        performance_layout.addWidget(self.synthesis_workers_spin, 0, 1)
+
+        # Number of text chunks run through the model per inference call
+        performance_layout.addWidget(QLabel("Inference batch size:"), 1, 0)
+        self.batch_size_spin = QSpinBox()
+        self.batch_size_spin.setRange(1, 32)
+        self.batch_size_spin.setValue(1)
+        self.batch_size_spin.setToolTip(
+            "Chunks of similar length are synthesized together in padded batches")
+        performance_layout.addWidget(self.batch_size_spin, 1, 1)
+
+        # Reuse previously synthesized audio for unchanged text
+        self.use_segment_cache_checkbox = QCheckBox("Reuse previously synthesized audio")
+        self.use_segment_cache_checkbox.setChecked(True)
+        performance_layout.addWidget(self.use_segment_cache_checkbox, 2, 0, 1, 2)
+
         # Buttons
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok |
                                       QDialogButtonBox.StandardButton.Cancel)
@@ -76,6 +121,8 @@ class OutputOptionsDialog(QDialog):
         # Add all components to main layout
         layout.addWidget(folder_group)
         layout.addWidget(format_group)
+        layout.addWidget(voices_group)
+        layout.addWidget(performance_group)
         layout.addWidget(button_box)
 
         # Set default destination folder (current working directory)
@@ -100,5 +147,11 @@ class OutputOptionsDialog(QDialog):
             'create_m4b': self.create_m4b_checkbox.isChecked(),
             'create_mp3': self.create_mp3_checkbox.isChecked(),
             'mp3_quality': self.mp3_quality_combo.currentText(),
-            'keep_wav': self.keep_wav_checkbox.isChecked()
+            'keep_wav': self.keep_wav_checkbox.isChecked(),
+            'synthesis_workers': self.synthesis_workers_spin.value(),
+            'use_segment_cache': self.use_segment_cache_checkbox.isChecked(),
+            'batch_size': self.batch_size_spin.value(),
+            'stream_m4b': self.stream_m4b_checkbox.isChecked(),
+            'extra_voices': [deemojify_voice(item.text())
+                             for item in self.extra_voices_list.selectedItems()]
         }
\ No newline at end of file
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from importlib import metadata
+
+from autiobooksqta.segment_cache import normalize_segment_text
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".audiobooks_cache", "phonemes.sqlite")
+
+
+def get_g2p_version():
+    """Version string of the G2P package, part of every cache key"""
+    try:
+        return f"misaki-{metadata.version('misaki')}"
+    except metadata.PackageNotFoundError:
+        return "misaki-unknown"
+
+
+class PhonemeCache:
+    """Persistent store of G2P output keyed by text hash and language code.
+    Phonemes don't depend on voice or speed, so one entry serves every
+    narrator and speed the text is rendered with. Safe to share between
+    threads and between processes on one host."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.g2p_version = get_g2p_version()
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS phonemes ("
+                "key TEXT PRIMARY KEY, lang_code TEXT NOT NULL, phonemes TEXT NOT NULL)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, text, lang_code):
+        raw = "\x1f".join([normalize_segment_text(text), lang_code, self.g2p_version])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text, lang_code):
+        """Phoneme strings for text, or None on a miss"""
+        row = self._connection().execute(
+            "SELECT phonemes FROM phonemes WHERE key = ?", (self.key(text, lang_code),)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, text, lang_code, phonemes):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO phonemes (key, lang_code, phonemes) VALUES (?, ?, ?)",
+                (self.key(text, lang_code), lang_code, json.dumps(phonemes))
+            )
+
+    def get_or_compute(self, text, lang_code, compute):
+        phonemes = self.get(text, lang_code)
+        if phonemes is None:
+            phonemes = compute(text)
+            self.put(text, lang_code, phonemes)
+        return phonemes
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM phonemes")
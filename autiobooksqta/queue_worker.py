@@ -0,0 +1,283 @@
+import glob
+import os
+import re
+import shutil
+import threading
+import time
+
+import torch
+
+from autiobooksqta.conversion_engine import BookConversion
+from autiobooksqta.engine_pyqt import (get_book, convert_text_to_wav_file, set_gpu_acceleration,
+                                       set_segment_cache_enabled, warm_pipeline)
+from autiobooksqta.job_journal import ChapterCheckpoint, load_chapter_checkpoint
+from autiobooksqta.job_queue import default_worker_id
+from autiobooksqta.chapter_scheduler import chapter_cost
+
+# Seconds to wait before polling again when other workers hold all the work
+POLL_INTERVAL = 5.0
+
+# BookConversion options that apply to queued books; queued chapters are
+# always synthesized to WAV, one voice per queued book
+QUEUE_OPTIONS = ('output_folder', 'create_m4b', 'create_mp3', 'mp3_quality', 'keep_wav',
+                 'use_segment_cache', 'batch_size')
+
+
+class ClaimLost(Exception):
+    """Another worker took over a chapter whose lease expired"""
+
+
+class LeasedCheckpoint(ChapterCheckpoint):
+    """Chapter checkpoint that renews the worker's claim on the chapter
+    every time progress is saved. Progress is only saved while the claim
+    is held, so a worker that lost it never moves the checkpoint."""
+
+    def __init__(self, checkpoint, renew):
+        super().__init__(checkpoint.journal_dir, checkpoint.index, checkpoint.text_digest,
+                         checkpoint.start_chunk, checkpoint.start_frames)
+        self.renew = renew
+
+    def __call__(self, chunk, frames):
+        if not self.renew():
+            raise ClaimLost(f"Lost the claim on chapter {self.index}")
+        super().__call__(chunk, frames)
+
+
+class LeaseHeartbeat:
+    """Renews a claim every interval seconds on a background thread until
+    stopped. If a renewal fails, lost is set and on_lost is called."""
+
+    def __init__(self, renew, interval, on_lost=None):
+        self.renew = renew
+        self.interval = interval
+        self.on_lost = on_lost
+        self.lost = False
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            if not self.renew():
+                self.lost = True
+                if self.on_lost:
+                    self.on_lost()
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+        self._thread.join()
+
+
+def partial_wav(wav_file, worker_id):
+    """Where a worker writes a chapter before it is complete. Each worker
+    has its own, so a worker that lost its claim can't overwrite the WAV of
+    the worker that took the chapter over. Keeps the .wav extension, which
+    soundfile needs to pick the format."""
+    stem = os.path.splitext(wav_file)[0]
+    return f"{stem}.{re.sub(r'[^A-Za-z0-9_.-]', '_', worker_id)}.partial.wav"
+
+
+def _partials(wav_file):
+    return glob.glob(glob.escape(os.path.splitext(wav_file)[0]) + ".*.partial.wav")
+
+
+def adopt_partial(wav_file, own_partial):
+    """Copy the newest partial WAV another worker left for this chapter, so
+    synthesis resumes at the chapter's checkpoint. A copy, not a rename: a
+    stalled former owner may still be writing its own file."""
+    if os.path.exists(own_partial):
+        return
+    partials = [p for p in _partials(wav_file) if p != own_partial]
+    if partials:
+        shutil.copyfile(max(partials, key=os.path.getmtime), own_partial)
+
+
+def remove_partials(wav_file):
+    for path in _partials(wav_file):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def book_conversion(file_path, settings, use_gpu=False, **callbacks):
+    """BookConversion for a queued book, selecting the same chapters as
+    when it was queued"""
+    book, chapters, _ = get_book(file_path, False)
+    selected = [chapters[j] for j in settings['chapters']]
+    return BookConversion(book, selected, settings['voice'], settings['speed'], use_gpu,
+                          file_path, **settings['options'], **callbacks)
+
+
+def queued_book(file_path, voice, speed=1.0, chapters=None, **options):
+    """Settings, (chapter index, text, WAV path) work units and estimated
+    chapter costs for queueing an EPUB. chapters is a list of positions in
+    the book's chapter list and defaults to every chapter with text.
+    Returns None if there is nothing to convert."""
+    book, book_chapters, _ = get_book(file_path, False)
+    with book:
+        if chapters is None:
+            chapters = [j for j, c in enumerate(book_chapters) if c.extracted_text.strip()]
+        if not chapters:
+            print(f"No chapters with text in {file_path}")
+            return None
+        options = {k: v for k, v in options.items() if k in QUEUE_OPTIONS}
+        conversion = BookConversion(book, [book_chapters[j] for j in chapters], voice, speed,
+                                    False, file_path, **options)
+        settings = {
+            'voice': voice,
+            'speed': float(speed),
+            'chapters': chapters,
+            'options': options,
+            # Chapter checkpoints go where the book's own journal keeps them
+            'journal_dir': os.path.join(conversion.output_folder, f"{conversion.base_filename}.journal")
+        }
+        chapter_jobs = conversion.chapter_jobs()
+        costs = [chapter_cost(text, voice[0]) for _, text, _ in chapter_jobs]
+        return settings, chapter_jobs, costs
+
+
+def enqueue_book(queue, file_path, voice, speed=1.0, chapters=None, **options):
+    """Queue an EPUB for conversion by queue workers. Returns the book id,
+    or None if there is nothing to convert."""
+    queued = queued_book(file_path, voice, speed, chapters, **options)
+    if queued is None:
+        return None
+    return queue.add_book(file_path, *queued)
+
+
+def shard_book(queue, file_path, voice, speed=1.0, chapters=None, **options):
+    """Split an EPUB into chapter work units on a ShardQueue. The EPUB is
+    copied into the shared folder and, unless an output folder is given,
+    the chapter WAVs and m4b are written there too, so any node can
+    synthesize or assemble it. Returns the book id, or None."""
+    book_id = queue.new_book_id()
+    shared_path = queue.copy_book(file_path, book_id)
+    if not options.get('output_folder'):
+        options['output_folder'] = queue.book_folder(book_id)
+    queued = queued_book(shared_path, voice, speed, chapters, **options)
+    if queued is None:
+        shutil.rmtree(queue.book_folder(book_id), ignore_errors=True)
+        return None
+    return queue.add_book(shared_path, *queued, book_id=book_id)
+
+
+class QueueWorker:
+    """Drains a JobQueue: synthesizes claimed chapters to WAV and, once all
+    chapters of a book are done, encodes and assembles the book. The loaded
+    pipeline stays warm across chapters and books. num_threads limits
+    torch's threads, so workers sharing a machine don't oversubscribe it."""
+
+    def __init__(self, queue, worker_id=None, use_gpu=False, poll_interval=POLL_INTERVAL,
+                 num_threads=None):
+        self.queue = queue
+        self.worker_id = worker_id or default_worker_id()
+        self.use_gpu = use_gpu
+        self.poll_interval = poll_interval
+        self.num_threads = num_threads
+        self.running = True
+
+    def run(self, exit_when_idle=True):
+        if self.num_threads:
+            torch.set_num_threads(max(1, self.num_threads))
+        set_gpu_acceleration(self.use_gpu)
+        while self.running:
+            chapter = self.queue.claim_chapter(self.worker_id)
+            if chapter:
+                self.synthesize(chapter)
+                continue
+            book = self.queue.claim_assembly(self.worker_id)
+            if book:
+                self.assemble(book)
+                continue
+            if exit_when_idle and not self.queue.unfinished_books():
+                return
+            time.sleep(self.poll_interval)
+
+    def synthesize(self, chapter):
+        settings = chapter.settings
+        options = settings['options']
+        print(f"[{self.worker_id}] Chapter {chapter.index} of {chapter.file_path} "
+              f"(attempt {chapter.attempts})")
+        renew = lambda: self.queue.renew_chapter(chapter.book_id, chapter.index, self.worker_id)
+        partial = partial_wav(chapter.wav_file, self.worker_id)
+        try:
+            set_segment_cache_enabled(options.get('use_segment_cache', True))
+            warm_pipeline(settings['voice'][0])
+            os.makedirs(os.path.dirname(chapter.wav_file), exist_ok=True)
+
+            # Checkpoints let a retry resume mid-chapter
+            journal_dir = settings['journal_dir']
+            os.makedirs(journal_dir, exist_ok=True)
+            checkpoint = LeasedCheckpoint(
+                load_chapter_checkpoint(journal_dir, chapter.index, chapter.text), renew)
+            adopt_partial(chapter.wav_file, partial)
+            samples = convert_text_to_wav_file(chapter.text, settings['voice'], settings['speed'],
+                                               partial, checkpoint=checkpoint,
+                                               batch_size=options.get('batch_size', 1))
+            if not renew():
+                raise ClaimLost(f"Lost the claim on chapter {chapter.index}")
+            if os.path.exists(partial):
+                os.replace(partial, chapter.wav_file)
+        except ClaimLost as e:
+            # The chapter belongs to another worker now; drop this attempt
+            print(f"[{self.worker_id}] {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            return
+        except Exception as e:
+            print(f"[{self.worker_id}] Chapter {chapter.index} failed: {e}")
+            self.queue.fail_chapter(chapter.book_id, chapter.index, self.worker_id, e)
+            return
+        if self.queue.complete_chapter(chapter.book_id, chapter.index, self.worker_id, samples):
+            remove_partials(chapter.wav_file)
+        else:
+            print(f"[{self.worker_id}] Lost the claim on chapter {chapter.index} "
+                  f"as it finished; the new owner completes it")
+
+    def assemble(self, book):
+        """Record the finished chapters in the book's journal and run the
+        conversion, which then skips synthesis and only encodes and muxes"""
+        print(f"[{self.worker_id}] Assembling {book.file_path}")
+        errors = []
+        conversions = []
+
+        def claim_lost():
+            # Another worker may take the book over; stop writing its outputs
+            for conversion in conversions:
+                conversion.stop()
+
+        heartbeat = LeaseHeartbeat(lambda: self.queue.renew_assembly(book.book_id, self.worker_id),
+                                   self.queue.claim_timeout / 3, claim_lost)
+        with heartbeat:
+            try:
+                conversion = book_conversion(book.file_path, book.settings, self.use_gpu,
+                                             on_error=errors.append)
+                conversions.append(conversion)
+                if heartbeat.lost:
+                    conversion.stop()
+                journal = conversion.open_journal()
+                for i, text, wav_file, samples in self.queue.book_chapters(book.book_id):
+                    if samples:
+                        journal.mark_chapter_done(i, text, wav_file, samples)
+                ok = conversion.run()
+            except Exception as e:
+                errors.append(str(e))
+                ok = False
+            finally:
+                if conversions:
+                    conversions[0].book.close()
+        if heartbeat.lost:
+            print(f"[{self.worker_id}] Lost the assembly claim on {book.file_path}")
+            return
+        if ok:
+            self.queue.finish_book(book.book_id)
+        else:
+            self.queue.finish_book(book.book_id, errors[0] if errors else "Assembly failed")
+
+    def stop(self):
+        self.running = False
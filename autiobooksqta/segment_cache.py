@@ -0,0 +1,138 @@
+import hashlib
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+from importlib import metadata
+
+import soundfile
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".audiobooks_cache", "segments")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB
+
+# Samples handed out per block when reading a cached segment back
+READ_BLOCK_SIZE = 24000 * 10
+
+
+def get_model_version():
+    """Version string of the TTS model package, part of every cache key"""
+    try:
+        return f"kokoro-{metadata.version('kokoro')}"
+    except metadata.PackageNotFoundError:
+        return "kokoro-unknown"
+
+
+def normalize_segment_text(text):
+    """Collapse whitespace so cosmetic differences don't miss the cache"""
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class SegmentCache:
+    """On-disk cache of synthesized audio keyed by segment text, voice,
+    speed and model version. Entries are float WAV files named by the
+    SHA-256 of the key; the least recently used are evicted once the cache
+    grows past max_bytes."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES,
+                 sample_rate=24000):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.model_version = get_model_version()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    def key(self, text, voice, speed):
+        raw = "\x1f".join([normalize_segment_text(text), voice,
+                           f"{float(speed):.3f}", self.model_version])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + '.wav')
+
+    def read(self, key):
+        """Yield the cached audio in blocks, or return None on a miss"""
+        path = self.path(key)
+        try:
+            # Opened now, so an entry evicted or cleared by another thread
+            # is a miss here rather than an error once reading starts
+            f = soundfile.SoundFile(path)
+        except (OSError, RuntimeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            # Touch the entry so LRU eviction sees it as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return self._blocks(f)
+
+    @staticmethod
+    def _blocks(f):
+        with f:
+            yield from f.blocks(blocksize=READ_BLOCK_SIZE, dtype='float32')
+
+    @contextmanager
+    def writer(self, key):
+        """Open a SoundFile for a new entry; it only becomes visible in the
+        cache once the with-block finishes without an error"""
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with soundfile.SoundFile(temp_path, 'w', samplerate=self.sample_rate,
+                                     channels=1, subtype='FLOAT', format='WAV') as f:
+                yield f
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self._lock:
+            self._total_bytes += os.path.getsize(path)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+    def _entries(self):
+        """(path, size, last used) for every complete entry"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.wav'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 90% of its cap"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
@@ -0,0 +1,390 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import uuid
+
+from autiobooksqta.job_journal import write_json_atomic, read_json
+from autiobooksqta.job_queue import CLAIM_TIMEOUT, MAX_ATTEMPTS
+
+
+class ShardedChapter:
+    def __init__(self, book_id, index, chapter, book, attempts):
+        self.book_id = book_id
+        self.index = index
+        self.text = chapter['text']
+        self.wav_file = chapter['wav_file']
+        self.attempts = attempts
+        self.settings = book['settings']
+        self.file_path = book['file_path']
+
+
+class ShardedBook:
+    def __init__(self, book_id, book):
+        self.book_id = book_id
+        self.file_path = book['file_path']
+        self.settings = book['settings']
+
+
+class ShardQueue:
+    """Job queue kept as plain files in a directory shared by several
+    machines (e.g. over NFS), where SQLite locking can't be trusted. Each
+    book is split into one work unit per chapter:
+
+        <root>/books/<id>/book.json           EPUB path (copied into the book
+        <root>/books/<id>/<name>.epub         folder) and settings
+        <root>/books/<id>/chapters/<n>.json   chapter text and WAV path
+        <root>/books/<id>/order.json          chapters by descending cost
+        <root>/books/<id>/leases/<n>.lease    claim, created with O_EXCL
+        <root>/books/<id>/done/<n>.json       finished chapter
+        <root>/books/<id>/failures/<n>.json   failed attempts
+        <root>/books/<id>/assembly.lease      claim on building the m4b
+        <root>/books/<id>/assembled.json      or failed.json, when finished
+
+    A lease, including the assembly lease, is renewed by touching it; one
+    whose mtime is older than claim_timeout is broken by the next worker. Node clocks must be kept
+    in sync (NTP). Offers the same interface as JobQueue, so QueueWorker
+    drains either."""
+
+    def __init__(self, root, claim_timeout=CLAIM_TIMEOUT):
+        self.root = os.path.abspath(root)
+        self.books_dir = os.path.join(self.root, "books")
+        self.claim_timeout = claim_timeout
+        os.makedirs(self.books_dir, exist_ok=True)
+
+    def _book_dir(self, book_id):
+        return os.path.join(self.books_dir, str(book_id))
+
+    def _path(self, book_id, kind, index):
+        suffix = 'lease' if kind == 'leases' else 'json'
+        return os.path.join(self._book_dir(book_id), kind, f"{index}.{suffix}")
+
+    def book_folder(self, book_id):
+        """Folder holding a book's shared files; the default output folder"""
+        return self._book_dir(book_id)
+
+    def new_book_id(self):
+        """Reserve a book id. mkdir is atomic, so concurrent coordinators
+        never share an id."""
+        existing = [int(name) for name in os.listdir(self.books_dir) if name.isdigit()]
+        book_id = max(existing, default=0) + 1
+        while True:
+            try:
+                os.mkdir(self._book_dir(book_id))
+                return book_id
+            except FileExistsError:
+                book_id += 1
+
+    def add_book(self, file_path, settings, chapter_jobs, costs=None, book_id=None):
+        """Write a book's work units. file_path should already be inside the
+        book's folder so every node can read it. Chapters are claimed in
+        order of descending cost. Returns the book id."""
+        costs = costs or [0] * len(chapter_jobs)
+        if book_id is None:
+            book_id = self.new_book_id()
+        book_dir = self._book_dir(book_id)
+        for kind in ('chapters', 'leases', 'done', 'failures'):
+            os.makedirs(os.path.join(book_dir, kind), exist_ok=True)
+        for i, text, wav_file in chapter_jobs:
+            write_json_atomic(self._path(book_id, 'chapters', i),
+                              {'text': text, 'wav_file': os.path.abspath(wav_file)})
+        order = sorted(zip(costs, chapter_jobs), key=lambda item: (-item[0], item[1][0]))
+        write_json_atomic(os.path.join(book_dir, "order.json"), [job[0] for _, job in order])
+        # Written last: a book without book.json is still being queued
+        write_json_atomic(os.path.join(book_dir, "book.json"), {
+            'file_path': os.path.abspath(file_path),
+            'settings': settings,
+            'created_at': time.time()
+        })
+        return book_id
+
+    def copy_book(self, file_path, book_id):
+        """Copy an EPUB into the book's shared folder, keeping its name"""
+        shared_path = os.path.join(self._book_dir(book_id), os.path.basename(file_path))
+        shutil.copyfile(file_path, shared_path)
+        return shared_path
+
+    def _books(self):
+        """(book id, book.json) for every queued book that isn't finished"""
+        for name in sorted(os.listdir(self.books_dir), key=lambda n: int(n) if n.isdigit() else 0):
+            if not name.isdigit():
+                continue
+            book_dir = os.path.join(self.books_dir, name)
+            if (os.path.exists(os.path.join(book_dir, "assembled.json"))
+                    or os.path.exists(os.path.join(book_dir, "failed.json"))):
+                continue
+            book = read_json(os.path.join(book_dir, "book.json"))
+            if book:
+                yield int(name), book
+
+    def _chapter_indexes(self, book_id):
+        folder = os.path.join(self._book_dir(book_id), 'chapters')
+        return sorted(int(name.split('.')[0]) for name in os.listdir(folder)
+                      if name.endswith('.json'))
+
+    def _expired(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.claim_timeout
+        except FileNotFoundError:
+            return True
+
+    def _acquire(self, path, worker_id, on_break=None):
+        """Create a lease file exclusively, breaking it first if it expired.
+        on_break() is called by the one worker that breaks a stale lease."""
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not self._expired(path):
+                return False
+            # Only the worker whose rename succeeds breaks the stale lease
+            stale = f"{path}.{uuid.uuid4().hex}.stale"
+            try:
+                os.rename(path, stale)
+            except FileNotFoundError:
+                return False
+            if not self._expired(stale):
+                # Renewed just before we moved it; put it back
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                os.remove(stale)
+                return False
+            os.remove(stale)
+            if on_break:
+                on_break()
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': worker_id, 'host': socket.gethostname(),
+                       'claimed_at': time.time()}, f)
+        return True
+
+    def _owns(self, path, worker_id):
+        lease = read_json(path)
+        return bool(lease) and lease.get('worker') == worker_id
+
+    def _release(self, path, worker_id):
+        if self._owns(path, worker_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _attempts(self, book_id, index):
+        failures = read_json(self._path(book_id, 'failures', index))
+        return failures['count'] if failures else 0
+
+    def _claim_order(self, book_id):
+        order = read_json(os.path.join(self._book_dir(book_id), "order.json"))
+        return order if order is not None else self._chapter_indexes(book_id)
+
+    def claim_chapter(self, worker_id):
+        for book_id, book in self._books():
+            for i in self._claim_order(book_id):
+                if os.path.exists(self._path(book_id, 'done', i)):
+                    continue
+                if self._attempts(book_id, i) >= MAX_ATTEMPTS:
+                    continue
+                broken = []
+                if not self._acquire(self._path(book_id, 'leases', i), worker_id,
+                                     on_break=lambda: broken.append(True)):
+                    continue
+                if broken and self._record_failure(
+                        book_id, i, worker_id,
+                        "Lease expired; the worker may have crashed") >= MAX_ATTEMPTS:
+                    # A chapter that keeps killing its worker fails its book
+                    self._release(self._path(book_id, 'leases', i), worker_id)
+                    break
+                if os.path.exists(self._path(book_id, 'done', i)):
+                    # Finished between the check and the claim
+                    self._release(self._path(book_id, 'leases', i), worker_id)
+                    continue
+                chapter = read_json(self._path(book_id, 'chapters', i))
+                return ShardedChapter(book_id, i, chapter, book,
+                                      self._attempts(book_id, i) + 1)
+        return None
+
+    def renew_chapter(self, book_id, index, worker_id):
+        path = self._path(book_id, 'leases', index)
+        if not self._owns(path, worker_id):
+            return False
+        os.utime(path)
+        return True
+
+    def complete_chapter(self, book_id, index, worker_id, samples):
+        """Record a finished chapter. Returns False, writing nothing, if the
+        worker no longer holds the chapter's lease."""
+        lease = read_json(self._path(book_id, 'leases', index))
+        if not lease or lease.get('worker') != worker_id:
+            return False
+        now = time.time()
+        write_json_atomic(self._path(book_id, 'done', index), {
+            'worker': worker_id,
+            'samples': samples,
+            'started_at': lease.get('claimed_at'),
+            'finished_at': now,
+            'seconds': now - lease['claimed_at'] if 'claimed_at' in lease else None
+        })
+        self._release(self._path(book_id, 'leases', index), worker_id)
+        return True
+
+    def _record_failure(self, book_id, index, worker_id, error):
+        """Count a failed or abandoned attempt; the book fails at
+        MAX_ATTEMPTS. Returns the attempt count."""
+        count = self._attempts(book_id, index) + 1
+        write_json_atomic(self._path(book_id, 'failures', index),
+                          {'count': count, 'error': str(error), 'worker': worker_id})
+        if count >= MAX_ATTEMPTS:
+            self.finish_book(book_id, f"Chapter {index}: {error}")
+        return count
+
+    def fail_chapter(self, book_id, index, worker_id, error):
+        self._record_failure(book_id, index, worker_id, error)
+        self._release(self._path(book_id, 'leases', index), worker_id)
+
+    def claim_assembly(self, worker_id):
+        for book_id, book in self._books():
+            if not all(os.path.exists(self._path(book_id, 'done', i))
+                       for i in self._chapter_indexes(book_id)):
+                continue
+            if self._acquire(os.path.join(self._book_dir(book_id), "assembly.lease"), worker_id):
+                return ShardedBook(book_id, book)
+        return None
+
+    def renew_assembly(self, book_id, worker_id):
+        """Extend an assembly claim. Returns False if the claim was lost."""
+        path = os.path.join(self._book_dir(book_id), "assembly.lease")
+        if not self._owns(path, worker_id):
+            return False
+        os.utime(path)
+        return True
+
+    def book_chapters(self, book_id):
+        chapters = []
+        for i in self._chapter_indexes(book_id):
+            chapter = read_json(self._path(book_id, 'chapters', i))
+            done = read_json(self._path(book_id, 'done', i)) or {}
+            chapters.append((i, chapter['text'], chapter['wav_file'], done.get('samples')))
+        return chapters
+
+    def finish_book(self, book_id, error=None):
+        book_dir = self._book_dir(book_id)
+        if error:
+            write_json_atomic(os.path.join(book_dir, "failed.json"),
+                              {'error': error, 'finished_at': time.time()})
+        else:
+            write_json_atomic(os.path.join(book_dir, "assembled.json"),
+                              {'finished_at': time.time()})
+        try:
+            os.remove(os.path.join(book_dir, "assembly.lease"))
+        except FileNotFoundError:
+            pass
+
+    def unfinished_books(self):
+        return sum(1 for _ in self._books())
+
+    def retry_failed(self):
+        for name in os.listdir(self.books_dir):
+            book_dir = os.path.join(self.books_dir, name)
+            failed = os.path.join(book_dir, "failed.json")
+            if os.path.exists(failed):
+                shutil.rmtree(os.path.join(book_dir, "failures"), ignore_errors=True)
+                os.makedirs(os.path.join(book_dir, "failures"), exist_ok=True)
+                os.remove(failed)
+
+    def status(self):
+        books = {}
+        chapters = {}
+        seconds = []
+        for name in os.listdir(self.books_dir):
+            if not name.isdigit():
+                continue
+            book_id = int(name)
+            book_dir = self._book_dir(book_id)
+            if os.path.exists(os.path.join(book_dir, "assembled.json")):
+                state = 'done'
+            elif os.path.exists(os.path.join(book_dir, "failed.json")):
+                state = 'failed'
+            elif os.path.exists(os.path.join(book_dir, "assembly.lease")):
+                state = 'assembling'
+            else:
+                state = 'running'
+            books[state] = books.get(state, 0) + 1
+            if not os.path.exists(os.path.join(book_dir, 'chapters')):
+                continue
+            for i in self._chapter_indexes(book_id):
+                done = read_json(self._path(book_id, 'done', i))
+                if done:
+                    chapter_state = 'done'
+                    if done.get('seconds') is not None:
+                        seconds.append(done['seconds'])
+                elif self._attempts(book_id, i) >= MAX_ATTEMPTS:
+                    chapter_state = 'failed'
+                elif os.path.exists(self._path(book_id, 'leases', i)):
+                    chapter_state = 'running'
+                else:
+                    chapter_state = 'pending'
+                chapters[chapter_state] = chapters.get(chapter_state, 0) + 1
+        return {
+            'books': books,
+            'chapters': chapters,
+            'chapter_seconds': sum(seconds),
+            'mean_chapter_seconds': sum(seconds) / len(seconds) if seconds else 0.0,
+            'longest_chapter_seconds': max(seconds, default=0.0)
+        }
+
+
+def _claim_all(root, worker_id, results):
+    queue = ShardQueue(root)
+    claimed = []
+    while True:
+        chapter = queue.claim_chapter(worker_id)
+        if chapter is None:
+            break
+        claimed.append(chapter.index)
+        queue.complete_chapter(chapter.book_id, chapter.index, worker_id, 1)
+    results.put((worker_id, claimed))
+
+
+def check_concurrent_claims(processes=4, chapters=200):
+    """Have several processes drain one queue at once and check that every
+    chapter was claimed exactly once. Point TMPDIR at an NFS mount to test
+    the shared folder itself. Returns True if no chapter was lost or
+    claimed twice."""
+    root = tempfile.mkdtemp(prefix="autiobooks_shards_")
+    try:
+        queue = ShardQueue(root)
+        jobs = [(i, f"Chapter {i}.", os.path.join(root, f"{i}.wav")) for i in range(1, chapters + 1)]
+        queue.add_book(os.path.join(root, "book.epub"), {}, jobs)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        workers = [context.Process(target=_claim_all, args=(root, f"check-{n}", results))
+                   for n in range(processes)]
+        for worker in workers:
+            worker.start()
+        claims = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+        counts = {}
+        for worker_id, claimed in claims:
+            print(f"{worker_id}: {len(claimed)} chapters")
+            for i in claimed:
+                counts[i] = counts.get(i, 0) + 1
+        duplicates = sorted(i for i, count in counts.items() if count > 1)
+        missing = sorted(set(range(1, chapters + 1)) - set(counts))
+        print(f"Claimed twice: {duplicates or 'none'}; never claimed: {missing or 'none'}")
+        return not duplicates and not missing
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    # python -m autiobooksqta.shard_queue [processes] [chapters]
+    sys.exit(0 if check_concurrent_claims(*(int(a) for a in sys.argv[1:3])) else 1)
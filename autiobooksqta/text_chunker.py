@@ -0,0 +1,119 @@
+import re
+
+# Estimated phoneme tokens per chunk; kokoro's hard limit is 510 per inference
+TARGET_TOKENS = 250
+MAX_TOKENS = 400
+
+# Sentence ends at . ! ? or an ellipsis, optionally followed by a closing quote or
+# bracket. Chinese and Japanese terminators need no space after them.
+SENTENCE_BREAK = re.compile(r'(?:(?<=[.!?…])|(?<=[.!?…]["\'”’)\]]))\s+'
+                            r'|(?:(?<=[。！？])(?![」』”’）])|(?<=[。！？][」』”’）]))\s*')
+CLAUSE_BREAK = re.compile(r'(?<=[,;:—])\s+|(?<=[，、；：])\s*')
+
+# Scripts written without spaces between words
+UNSPACED = re.compile(r'[\u2e80-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+# Phonemes per Chinese or Japanese character; each is a syllable or more
+UNSPACED_TOKENS = 3
+
+
+def estimate_tokens(text):
+    """Rough phoneme count; English G2P emits about one phoneme per character"""
+    return len(text) + (UNSPACED_TOKENS - 1) * len(UNSPACED.findall(text))
+
+
+def split_sentences(paragraph):
+    return [s.strip() for s in SENTENCE_BREAK.split(paragraph) if s.strip()]
+
+
+def join_pieces(pieces):
+    """Join with spaces, except between pieces of unspaced (CJK) text"""
+    text = ''
+    for piece in pieces:
+        if text and not (UNSPACED.match(text[-1]) or UNSPACED.match(piece[0])):
+            text += ' '
+        text += piece
+    return text
+
+
+def hard_split(word, max_tokens=MAX_TOKENS):
+    """Cut a run with no break point into pieces of at most max_tokens"""
+    pieces, start, tokens = [], 0, 0
+    for i, char in enumerate(word):
+        char_tokens = estimate_tokens(char)
+        if i > start and tokens + char_tokens > max_tokens:
+            pieces.append(word[start:i])
+            start, tokens = i, 0
+        tokens += char_tokens
+    pieces.append(word[start:])
+    return pieces
+
+
+def split_long_sentence(sentence, max_tokens=MAX_TOKENS):
+    """Break a sentence that won't fit in one chunk at clause boundaries,
+    falling back to word boundaries, then to a hard split for runs with
+    no break point at all"""
+    if estimate_tokens(sentence) <= max_tokens:
+        return [sentence]
+    pieces = []
+    for clause in CLAUSE_BREAK.split(sentence):
+        if not clause:
+            continue
+        if estimate_tokens(clause) <= max_tokens:
+            pieces.append(clause)
+            continue
+        words, current = [], []
+        for word in clause.split():
+            words.extend(hard_split(word, max_tokens))
+        for word in words:
+            if current and estimate_tokens(join_pieces(current + [word])) > max_tokens:
+                pieces.append(join_pieces(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(join_pieces(current))
+    return pack(pieces, max_tokens, max_tokens)
+
+
+def pack(pieces, target_tokens=TARGET_TOKENS, max_tokens=MAX_TOKENS):
+    """Greedily join pieces into chunks close to target_tokens"""
+    chunks, current = [], []
+    for piece in pieces:
+        candidate = join_pieces(current + [piece])
+        if current and estimate_tokens(candidate) > target_tokens:
+            chunks.append(join_pieces(current))
+            current = []
+        current.append(piece)
+    if current:
+        chunks.append(join_pieces(current))
+    return chunks
+
+
+def chunk_text(text, target_tokens=TARGET_TOKENS, max_tokens=MAX_TOKENS):
+    """Pack sentences into chunks near target_tokens. Chunks never span a
+    paragraph (line) break, so paragraph pauses are kept, and no chunk
+    exceeds max_tokens."""
+    chunks = []
+    for paragraph in text.split('\n'):
+        sentences = []
+        for sentence in split_sentences(paragraph):
+            sentences.extend(split_long_sentence(sentence, max_tokens))
+        chunks.extend(pack(sentences, target_tokens, max_tokens))
+    return chunks
+
+
+def split_paragraph_units(text, max_chars):
+    """Split text at line breaks into parts of roughly max_chars. Chunks
+    never span a line break, so chunking the parts in order gives exactly
+    the chunks of the whole text."""
+    parts, current, size = [], [], 0
+    for paragraph in text.split('\n'):
+        if current and size + len(paragraph) > max_chars:
+            parts.append('\n'.join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 1
+    if current:
+        parts.append('\n'.join(current))
+    return parts
@@ -38,6 +38,7 @@ setup(
     entry_points={
         "console_scripts": [
             "autiobooksqta=autiobooksqta.__main__:main",
+            "autiobooksqta-cli=autiobooksqta.cli:main",
         ],
     },
 )
\ No newline at end of file
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("bs4")
+
+from autiobooksqta import chapter_extractor
+from autiobooksqta.chapter_extractor import ChapterExtractor, VISIBLE, is_extracted
+
+
+class Chapter:
+    def __init__(self, number, readable=True):
+        self.number = number
+        self.readable = readable
+
+    def get_name(self):
+        return f"chapter{self.number}.xhtml"
+
+    def get_content(self):
+        if not self.readable:
+            raise KeyError(self.get_name())
+        return f"<html><body><p>Chapter {self.number}</p></body></html>".encode()
+
+
+def test_background_chapters_are_extracted_in_batches(monkeypatch):
+    batches = []
+    extract_texts = chapter_extractor.extract_texts
+
+    def record(documents, parallel=None):
+        batches.append(len(documents))
+        return extract_texts(documents, parallel)
+
+    monkeypatch.setattr(chapter_extractor, 'extract_texts', record)
+    monkeypatch.setattr(chapter_extractor, 'BACKGROUND_BATCH', 4)
+    chapters = [Chapter(n, readable=n != 3) for n in range(10)]
+    finished = threading.Event()
+
+    ChapterExtractor(chapters, on_finished=finished.set).start()
+
+    assert finished.wait(5)
+    assert [c.extracted_text for c in chapters] == [
+        '' if n == 3 else f"Chapter {n}\n" for n in range(10)]
+    assert sum(batches) == 9 and max(batches) <= 4
+
+
+def test_prioritized_chapter_is_extracted_alone():
+    chapters = [Chapter(n) for n in range(3)]
+    extractor = ChapterExtractor(chapters)
+    extractor.prioritize([chapters[2]], VISIBLE)
+
+    assert extractor._next() == [chapters[2]]
+    assert extractor._next() == chapters[:2]
+
+
+def test_ensure_extracts_on_calling_thread():
+    chapters = [Chapter(n) for n in range(3)]
+    extracted = []
+    extractor = ChapterExtractor(chapters, on_extracted=extracted.append)
+
+    extractor.ensure(chapters[1:])
+
+    assert extracted == chapters[1:]
+    assert not is_extracted(chapters[0])
+    assert chapters[2].word_count == 2
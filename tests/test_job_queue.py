@@ -0,0 +1,21 @@
+import time
+
+from autiobooksqta.job_queue import JobQueue, MAX_ATTEMPTS, FAILED
+
+
+def test_crashing_chapter_fails_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), claim_timeout=0.01)
+    queue.add_book(str(tmp_path / "book.epub"), {}, [(1, "text", str(tmp_path / "1.wav"))])
+
+    claims = 0
+    # Each claim is abandoned, as if the worker died mid-chapter
+    while queue.claim_chapter("worker") is not None:
+        claims += 1
+        time.sleep(0.02)
+        assert claims <= MAX_ATTEMPTS
+
+    assert claims == MAX_ATTEMPTS
+    status = queue.status()
+    assert status['chapters'] == {FAILED: 1}
+    assert status['books'] == {FAILED: 1}
+    assert queue.unfinished_books() == 0
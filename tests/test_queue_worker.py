@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+soundfile = pytest.importorskip("soundfile")
+pytest.importorskip("torch")
+pytest.importorskip("kokoro")
+
+from autiobooksqta import engine_pyqt, queue_worker
+from autiobooksqta.job_queue import JobQueue, DONE
+from autiobooksqta.queue_worker import QueueWorker
+
+
+def stub_chunk_audio(chunks, voice, speed, batch_size=1, start=0):
+    """Stands in for the model: 100 samples of silence per chunk"""
+    for index, _ in enumerate(chunks, start=start):
+        yield index, [np.zeros(100, dtype=np.float32)]
+
+
+@pytest.fixture
+def stub_pipeline(monkeypatch):
+    monkeypatch.setattr(engine_pyqt, 'iter_chunk_audio', stub_chunk_audio)
+    monkeypatch.setattr(queue_worker, 'warm_pipeline', lambda lang_code: None)
+
+
+def queue_chapter(tmp_path, text="One sentence. Another sentence."):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"))
+    wav_file = str(tmp_path / "out" / "book_chapter_1.wav")
+    settings = {
+        'voice': 'af_heart',
+        'speed': 1.0,
+        'chapters': [0],
+        'options': {'use_segment_cache': False},
+        'journal_dir': str(tmp_path / "out" / "book.journal")
+    }
+    book_id = queue.add_book(str(tmp_path / "book.epub"), settings, [(1, text, wav_file)])
+    return queue, book_id, wav_file
+
+
+def test_synthesize_writes_chapter_wav(tmp_path, stub_pipeline):
+    queue, book_id, wav_file = queue_chapter(tmp_path)
+    worker = QueueWorker(queue, worker_id="host:1")
+
+    worker.synthesize(queue.claim_chapter(worker.worker_id))
+
+    assert queue.status()['chapters'] == {DONE: 1}
+    assert soundfile.info(wav_file).frames > 0
+    assert queue.book_chapters(book_id)[0][3] == soundfile.info(wav_file).frames
+    # The worker's partial file became the chapter WAV
+    assert not [name for name in os.listdir(os.path.dirname(wav_file)) if 'partial' in name]
+
+
+def test_synthesize_discards_work_when_claim_lost(tmp_path, stub_pipeline, monkeypatch):
+    queue, book_id, wav_file = queue_chapter(tmp_path)
+    worker = QueueWorker(queue, worker_id="host:1")
+    monkeypatch.setattr(queue, 'renew_chapter', lambda *args: False)
+
+    worker.synthesize(queue.claim_chapter(worker.worker_id))
+
+    assert not os.path.exists(wav_file)
+    assert not os.path.exists(queue_worker.partial_wav(wav_file, worker.worker_id))
+    assert queue.status()['chapters'] != {DONE: 1}
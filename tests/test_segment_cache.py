@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("soundfile")
+
+from autiobooksqta.segment_cache import SegmentCache
+
+
+def test_entry_removed_after_read_still_plays(tmp_path):
+    cache = SegmentCache(str(tmp_path))
+    key = cache.key("Hello there.", "af_heart", 1.0)
+    with cache.writer(key) as f:
+        f.write(np.ones(1000, dtype='float32'))
+
+    blocks = cache.read(key)
+    os.remove(cache.path(key))
+
+    assert sum(len(block) for block in blocks) == 1000
+    assert cache.read(key) is None
+    assert (cache.hits, cache.misses) == (1, 1)
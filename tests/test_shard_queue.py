@@ -0,0 +1,24 @@
+import time
+
+from autiobooksqta.job_queue import MAX_ATTEMPTS
+from autiobooksqta.shard_queue import ShardQueue, check_concurrent_claims
+
+
+def test_crashing_chapter_fails_after_max_attempts(tmp_path):
+    queue = ShardQueue(str(tmp_path / "shards"), claim_timeout=0.05)
+    queue.add_book(str(tmp_path / "book.epub"), {}, [(1, "text", str(tmp_path / "1.wav"))])
+
+    claims = 0
+    # Each lease is abandoned, as if the worker died mid-chapter
+    while queue.claim_chapter(f"worker-{claims}") is not None:
+        claims += 1
+        time.sleep(0.1)
+        assert claims <= MAX_ATTEMPTS
+
+    assert claims == MAX_ATTEMPTS
+    assert queue.status()['books'] == {'failed': 1}
+    assert queue.unfinished_books() == 0
+
+
+def test_concurrent_claims_are_exclusive():
+    assert check_concurrent_claims(processes=3, chapters=60)
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("lxml")
+pytest.importorskip("bs4")
+
+from autiobooksqta.text_extractor import extract_text
+
+
+def xhtml(head=''):
+    return f'<html><head>{head}</head><body><p>café “quoted”</p></body></html>'
+
+
+@pytest.mark.parametrize('content', [
+    xhtml().encode('utf-8'),
+    b'\xef\xbb\xbf' + xhtml().encode('utf-8'),
+    xhtml().encode('utf-16'),
+    ('<?xml version="1.0" encoding="windows-1252"?>' + xhtml()).encode('windows-1252'),
+    xhtml('<meta charset="iso-8859-1"/>').encode('windows-1252'),
+    xhtml('<meta http-equiv="Content-Type" content="text/html; charset=windows-1252"/>')
+    .encode('windows-1252'),
+    # Undeclared, and not valid UTF-8
+    xhtml().encode('windows-1252'),
+    xhtml(),
+])
+def test_extract_text_decodes_declared_encoding(content):
+    assert extract_text(content) == 'café “quoted”\n'